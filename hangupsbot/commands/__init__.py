@@ -78,28 +78,13 @@ class CommandDispatcher(object):
             # current user chat_id
             subtokens[-1] = internal_context.user.id_.chat_id
         else:
-            user_memory = self.bot.memory["user_data"]
-            chat_ids = (list(self.bot.conversations[internal_context.conv_id]
-                             ["participants"])
-                        if all_users else list(user_memory.keys()))
-
-            matched_users = {}
-            for chat_id in chat_ids:
-                user_data = user_memory[chat_id]
-                nickname_lower = (user_data["nickname"].lower()
-                                  if "nickname" in user_data else "")
-                fullname_lower = user_data["_hangups"]["full_name"].lower()
-
-                if text == nickname_lower:
-                    matched_users[chat_id] = chat_id
-                    break
-
-                elif (text in fullname_lower or
-                      text in fullname_lower.replace(" ", "")):
-                    matched_users[chat_id] = chat_id
+            source = (self.bot.conversations.get_participants(
+                internal_context.conv_id) if all_users else None)
+            matched_users = self.bot.conversations.user_names.match(text,
+                                                                    source)
 
             if len(matched_users) == 1:
-                subtokens[-1] = list(matched_users)[0]
+                subtokens[-1] = matched_users.pop()
             elif not matched_users:
                 if not all_users:
                     # redo the user search, expanded to all users
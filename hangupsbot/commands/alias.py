@@ -88,6 +88,7 @@ def sethoalias(bot, event, *args):
 
     if newalias != 'none':
         alias_list[newalias] = conv_id
+    bot.memory.set_by_path(['hoalias'], alias_list)
     bot.memory.save()
 
     if newalias == 'none':
@@ -233,6 +233,89 @@ def resourcememory(*dummys):
     return "<b>memory (resource): {} MB</b>".format(mem)
 
 
+@command.register(admin=True)
+def configcache(bot, *dummys):
+    """list the cache hits and misses of config options"""
+
+    lines = [_("<b>config option cache:</b>")]
+    stats = bot.config.option_stats()
+    for key, (hits, misses) in sorted(stats.items(),
+                                      key=lambda item: -sum(item[1])):
+        lines.append(_("{}: {} hits, {} misses ({:.0%})").format(
+            key, hits, misses, hits / (hits + misses)))
+
+    return "\n".join(lines)
+
+
+@command.register(admin=True)
+def eventqueue(bot, dummy, *args):
+    """show the depth and the counters of the event queue"""
+    # pylint:disable=protected-access
+    stats = bot._handlers.queue.stats()
+    lines = [_("<b>event queue:</b>"),
+             _("waiting: {} in {} conversations (max {})").format(
+                 stats["depth"], stats["lanes"], stats["max_depth"]),
+             _("running: {}").format(stats["running"]),
+             _("queued: {}, processed: {}").format(stats["queued"],
+                                                    stats["processed"]),
+             _("coalesced: {}, dropped: {}, waited for space: {}").format(
+                 stats["coalesced"], stats["dropped"], stats["waited"])]
+    return "\n".join(lines)
+
+
+@command.register(admin=True)
+def memoryaudit(bot, dummy, *args):
+    """show the memory access per plugin, use "dump" to write a json report
+    or "reset" to clear the records"""
+    audit = bot.memory.audit
+    if audit is None:
+        return _("memory audit is disabled, set <i>memory-audit</i> in the "
+                 "config to <b>true</b> and restart the bot")
+
+    if args and args[0] == "reset":
+        audit.reset()
+        return _("memory audit reset")
+
+    if args and args[0] == "dump":
+        path = bot.memory.filename + ".audit.json"
+        try:
+            audit.dump(path, bot.memory)
+        except IOError as err:
+            logger.error("memory audit dump failed: %s", repr(err))
+            return _("memory audit dump failed")
+        return _("memory audit written to {}").format(path)
+
+    report = audit.report(bot.memory)
+    lines = [_("<b>memory saves:</b>")]
+    saves = sorted(((counts.get("save", 0), caller)
+                    for caller, counts in report["operations"].items()),
+                   reverse=True)
+    for count, caller in saves[:10]:
+        if count:
+            lines.append(_("{}: {}").format(caller, count))
+
+    lines.append(_("<b>bytes written:</b>"))
+    written = sorted(((entry["bytes_written"], caller, top)
+                      for caller, keys in report["keys"].items()
+                      for top, entry in keys.items()
+                      if "bytes_written" in entry), reverse=True)
+    for size, caller, top in written[:10]:
+        lines.append(_("{} in {}: {} bytes").format(caller, top, size))
+
+    lines.append(_("<b>largest entrys:</b>"))
+    for top, size in sorted(report["sections"].items(),
+                            key=lambda item: -item[1])[:10]:
+        lines.append(_("{}: {} bytes").format(top, size))
+
+    lines.append(_("<b>dump times:</b>"))
+    for filename, buckets in sorted(report["dumps"].items()):
+        lines.append(_("{}: {}").format(filename, ", ".join(
+            "{} {}".format(label, buckets[label])
+            for label in sorted(buckets))))
+
+    return "\n".join(lines)
+
+
 @command.register_unknown
 async def unknown_command(bot, event, *args):
     """handle unknown commands"""
@@ -8,7 +8,7 @@ logger = logging.getLogger(__name__)
 
 
 def _initialise(bot):
-    plugins.register_admin_command(["dumpconv", "dumpunknownusers", "resetunknownusers", "refreshusermemory", "removeconvrecord", "makeallusersindefinite"])
+    plugins.register_admin_command(["dumpconv", "dumpunknownusers", "resetunknownusers", "refreshusermemory", "removeconvrecord", "makeallusersindefinite", "archivememory"])
 
 
 def dumpconv(bot, event, *args):
@@ -63,7 +63,8 @@ def resetunknownusers(bot, event, *args):
 async def refreshusermemory(bot, event, *args):
     """refresh specified user chat ids with contact/getentitybyid"""
     logger.info("refreshusermemory started")
-    updated = await bot.conversations.get_users_from_query(args)
+    updated = await bot.conversations.get_users_from_query(args,
+                                                          force=True)
     logger.info("refreshusermemory {} updated".format(updated))
     logger.info("refreshusermemory ended")
 
@@ -96,3 +97,27 @@ def makeallusersindefinite(bot, event, *args):
     logger.info("makeallusersindefinite finished")
 
     return "<b>please see log/console</b>"
+
+
+def archivememory(bot, event, *args):
+    """show the size of the memory archive, use "sweep [days]" to move inactive
+    conversations and users to the archive now"""
+    if args and args[0] == "sweep":
+        try:
+            days = (int(args[1]) if len(args) > 1
+                    else bot.get_config_option("memory-archive_days"))
+        except ValueError:
+            days = None
+        if not days or days < 1:
+            return _("specify the number of days without activity or set "
+                     "<i>memory-archive_days</i> in the config")
+        try:
+            convs, users = bot.conversations.archive_inactive(days)
+        except (IOError, ValueError) as err:
+            logger.error("archive sweep failed: %s", repr(err))
+            return _("archive sweep failed")
+        return _("archived {} conversations and {} users").format(convs, users)
+
+    stats = bot.conversations.archive_stats()
+    return _("<b>archive:</b> {} conversations, {} users, {} bytes").format(
+        stats["convs"], stats["users"], stats["size"])
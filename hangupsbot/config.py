@@ -2,18 +2,322 @@
 
 import asyncio
 import collections
+import concurrent.futures
 from datetime import datetime
 import functools
 import json
 import glob
+import gzip
+import inspect
 import logging
 import operator
 import os
+import re
 import shutil
+import threading
 import time
+import zlib
 
 import hangups.event
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# file formats of Config, pretty is a human readable json
+SERIALIZERS = ('pretty', 'compact', 'gzip')
+
+_GZIP_MAGIC = b'\x1f\x8b'
+
+_MISSING = object()
+
+
+def compact_dumps(value):
+    """encode a value as compact json, use orjson if it is available
+
+    Args:
+        value: any type, a json serializable object
+
+    Returns:
+        string, json without whitespace
+
+    Raises:
+        TypeError: the value is not serializable
+    """
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(value, separators=(',', ':'))
+
+
+def loads(data):
+    """parse a json formated string, use orjson if it is available
+
+    Args:
+        data: string, json formated
+
+    Returns:
+        any type, the parsed object
+
+    Raises:
+        ValueError: the string is not valid json
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _accepts_argument(func):
+    """check weather a callable can be called with a single argument
+
+    Args:
+        func: callable, function or method
+
+    Returns:
+        boolean, True if a single positional argument is accepted
+    """
+    try:
+        inspect.signature(func).bind(None)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def diff_keys(old, new):
+    """compare the top level entrys of two dicts
+
+    Args:
+        old: dict, the previous state
+        new: dict, the current state
+
+    Returns:
+        list, sorted keys that were added, removed or have a different value
+    """
+    # check the presence first to skip loading the values of a LazyDict
+    return sorted(key for key in set(old).union(new)
+                  if key not in old or key not in new or old[key] != new[key])
+
+
+def split_sections(data):
+    """split a json formated dict into the raw values of its top level entrys
+
+    the layout requires one top level entry per line, as written by Config
+
+    Args:
+        data: string, a json formated dict
+
+    Returns:
+        dict, top level keys with their json formated values or None if the
+            layout is unknown
+
+    Raises:
+        ValueError: a top level key is not valid json
+    """
+    first = re.match(r'\s*\{\n( *)"', data)
+    if first is None:
+        return {} if data.strip() == '{}' else None
+
+    # nested lines are indented deeper, string values do not contain newlines
+    prefix = '\n%s"' % first.group(1)
+    key_pattern = re.compile(r'( *)("(?:[^"\\]|\\.)*"): ?')
+    matches = []
+    position = first.start(1) - 1
+    while position >= 0:
+        match = key_pattern.match(data, position + 1)
+        if match is None:
+            return None
+        matches.append(match)
+        position = data.find(prefix, match.end())
+
+    end = data.rfind('}')
+    if end < matches[-1].end():
+        return None
+
+    sections = {}
+    for match, following in zip(matches, matches[1:] + [None]):
+        stop = end if following is None else following.start()
+        while data[stop - 1].isspace():
+            stop -= 1
+        if following is not None:
+            if data[stop - 1] != ',':
+                return None
+            stop -= 1
+        # slice only once, the values might be large
+        sections[json.loads(match.group(2))] = data[match.end():stop]
+    return sections
+
+
+class LazyDict(dict):
+    """dict that creates the values of pending keys on first access
+
+    Args:
+        data: dict, the loaded entrys
+        pending: dict, keys with the raw data of the entrys to load on access
+        loader: callable, called with a key and its raw data, returns the
+            value of the entry
+    """
+    def __init__(self, data, pending, loader):
+        super().__init__(data)
+        self.pending = pending
+        self.loader = loader
+
+    def load(self, key):
+        """create the value of a pending key
+
+        Args:
+            key: string, a key in .pending
+
+        Raises:
+            KeyError: the key is not pending
+        """
+        raw = self.pending[key]
+        dict.__setitem__(self, key, self.loader(key, raw))
+        del self.pending[key]
+
+    def load_all(self):
+        """create the values of all pending keys"""
+        for key in list(self.pending):
+            self.load(key)
+
+    def __missing__(self, key):
+        if key not in self.pending:
+            raise KeyError(key)
+        self.load(key)
+        return dict.__getitem__(self, key)
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or key in self.pending
+
+    def __iter__(self):
+        yield from dict.__iter__(self)
+        yield from list(self.pending)
+
+    def __len__(self):
+        return dict.__len__(self) + len(self.pending)
+
+    def __setitem__(self, key, value):
+        self.pending.pop(key, None)
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        if key in self.pending:
+            del self.pending[key]
+            return
+        dict.__delitem__(self, key)
+
+    def __eq__(self, other):
+        self.load_all()
+        if isinstance(other, LazyDict):
+            other.load_all()
+        return dict.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        self.load_all()
+        return dict.__repr__(self)
+
+    def __reduce_ex__(self, protocol):
+        # copies and pickles are plain dicts
+        self.load_all()
+        return (dict, (dict(self.items()),))
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def setdefault(self, key, default=None):
+        if key in self.pending:
+            self.load(key)
+        return dict.setdefault(self, key, default)
+
+    def pop(self, key, *args):
+        if key in self.pending:
+            self.load(key)
+        return dict.pop(self, key, *args)
+
+    def popitem(self):
+        self.load_all()
+        return dict.popitem(self)
+
+    def update(self, *args, **kwargs):
+        other = dict(*args, **kwargs)
+        for key in other:
+            self.pending.pop(key, None)
+        dict.update(self, other)
+
+    def clear(self):
+        self.pending.clear()
+        dict.clear(self)
+
+    def copy(self):
+        self.load_all()
+        return dict(self.items())
+
+    def keys(self):
+        self.load_all()
+        return dict.keys(self)
+
+    def values(self):
+        self.load_all()
+        return dict.values(self)
+
+    def items(self):
+        self.load_all()
+        return dict.items(self)
+
+
+class ReloadEvent(hangups.event.Event):
+    """event that notifies observers about replaced config entrys
+
+    observers that accept an argument receive the list of changed top level
+    keys or None if the full config may have changed, any other observer is
+    called without arguments
+    """
+    async def fire(self, changed=None):
+        """call all observers
+
+        Args:
+            changed: list, changed top level keys, or None for all keys
+        """
+        for observer in list(self._observers):
+            if _accepts_argument(observer):
+                gen = observer(changed)
+            else:
+                gen = observer()
+            if asyncio.iscoroutinefunction(observer):
+                await gen
+
+
+class Transaction(object):
+    """context manager to defer the saves of a config
+
+    supports the usage as `with` and `async with` statement, the config is
+    saved once the outermost transaction ends
+
+    Args:
+        config: Config instance
+    """
+    def __init__(self, config):
+        self.config = config
+
+    def __enter__(self):
+        self.config._begin_transaction()
+        return self.config
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.config._end_transaction()
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.__exit__(exc_type, exc_value, traceback)
+
+
 class Config(collections.MutableMapping):
     """Configuration JSON storage class
 
@@ -21,18 +325,63 @@ class Config(collections.MutableMapping):
         path: string, file path of the config file
         default: any type, default value for missing data
         failsafe_backups: int, ammount of backups that should be kept
+        failsafe_interval: int, minimum time in seconds between two backups
         save_delay: int, time in second a dump should be delayed
+        threaded_save: boolean, toggle to write the file in a worker thread
+        journal_size: int, size in bytes of the journal that triggers a
+            rewrite of the file, set to 0 to dump the full file on each save
+        serializer: string, file format, 'pretty', 'compact' or 'gzip'
+        eager_sections: tuple, top level keys to parse on load, any other
+            entry is parsed on first access, None to parse all on load
+
+    Raises:
+        ValueError: unknown serializer
     """
-    def __init__(self, path, default=None, failsafe_backups=0, save_delay=0):
+    def __init__(self, path, default=None, failsafe_backups=0, save_delay=0,
+                 threaded_save=False, journal_size=0, failsafe_interval=0,
+                 serializer='pretty', eager_sections=None):
+        if serializer not in SERIALIZERS:
+            raise ValueError('unknown serializer "%s", use one of %s'
+                             % (serializer, SERIALIZERS))
         self.filename = path
+        self.serializer = serializer
+        self.eager_sections = eager_sections
         self.default = default
         self.config = {}
         self.defaults = {}
         self.failsafe_backups = failsafe_backups
+        self.failsafe_interval = failsafe_interval
         self.save_delay = save_delay
+        self.threaded_save = threaded_save
+        self.journal_size = journal_size
         self._last_dump = None
         self._timer_save = None
-        self.on_reload = hangups.event.Event('Config reload')
+        self._dump_lock = threading.Lock()
+        self._dump_seq = 0
+        self._pending_dumps = set()
+        self._executor = None
+        self._dirty = set()
+        self._fragments = {}
+        self._subfragments = {}
+        self._journal_pending = set()
+        self._journal_bytes = 0
+        self._compaction = None
+        self._last_backup = 0
+        self._file_checksum = None
+        self._file_signature = None
+        self._option_cache = {}
+        self._option_hits = collections.Counter()
+        self._option_misses = collections.Counter()
+        self._transaction_depth = 0
+        self._deferred_save = None
+        # optional config_audit.AccessAudit instance
+        self.audit = None
+        # callers of the save requests that did not run yet
+        self._save_callers = set()
+        # paths of dicts and lists handed out since the last save
+        self._handed_out = set()
+        self.on_reload = ReloadEvent('Config reload')
+        self.on_reload.add_observer(self._invalidate_options)
         self.logger = logging.getLogger(__name__)
 
     @property
@@ -40,33 +389,568 @@ class Config(collections.MutableMapping):
         """return weather the config changed since the last dump
 
         Returns:
-            boolean, True if config matches with the last dump, otherwise False
+            boolean, True if a subtree was touched since the last dump,
+                otherwise False
+        """
+        if self.journal_size:
+            return bool(self._journal_pending) or self._last_dump is None
+        return bool(self._dirty) or self._last_dump is None
+
+    @property
+    def _journal_filename(self):
+        """get the path of the journal file
+
+        Returns:
+            string
+        """
+        return self.filename + '.journal'
+
+    def _invalidate_options(self, changed=None):
+        """clear the cache of resolved options
+
+        Args:
+            changed: list, top level keys to invalidate, or None for all
+        """
+        if changed is None:
+            self._option_cache.clear()
+            return
+
+        changed = set(changed)
+        for path in list(self._option_cache):
+            # a suboption falls back to the top level entry of its keyname
+            if path[0] in changed or path[-1] in changed:
+                del self._option_cache[path]
+
+    def option_stats(self):
+        """get the cache usage of .get_option and .get_suboption per option
+
+        Returns:
+            dict, option names as keys and a tuple (hits, misses) as values
+        """
+        return {key: (self._option_hits[key], self._option_misses[key])
+                for key in set(self._option_hits).union(self._option_misses)}
+
+    def _mark_dirty(self, path):
+        """track a subtree of .config that needs to be encoded on next dump
+
+        the tracking is limited to the first two levels of the config
+
+        Args:
+            path: list, a list of strings, describing the path to the value
+        """
+        if not path:
+            paths = set((key,) for key in self.config)
+            paths.update((key,) for key in self._fragments)
+        else:
+            paths = (tuple(path[:2]),)
+
+        self._dirty.update(paths)
+        if self.journal_size:
+            self._journal_pending.update(paths)
+
+    def _stored_sections(self):
+        """get the top level keys that are covered by the cached dump data
+
+        Returns:
+            iterable of strings
+        """
+        return self._fragments
+
+    def _mark_removed(self):
+        """track top level entrys that were removed from .config directly
+
+        a `del memory.config[key]` bypasses the dirty tracking, without this
+        the entry of the last dump would stay in the file
         """
+        # the entrys of a load are not encoded before the first dump
+        stored = set(self._stored_sections())
+        stored.update(path[0] for path in self._dirty)
+        removed = [key for key in stored if key not in self.config]
+        for key in removed:
+            self._mark_dirty([key])
+
+    def _hand_out(self, path, value):
+        """remember a dict or list that might be changed in place
+
+        Args:
+            path: list, a list of strings, describing the path to the value
+            value: any type, the value that is handed out
+        """
+        if path and isinstance(value, (dict, list)):
+            self._handed_out.add(tuple(path[:2]))
+
+    def _check_in_place(self):
+        """[compat] dump handed out values that were changed in place
+
+        a save without dirty paths compares the dicts and lists that were
+        handed out since the last save with their cached fragments. Changes
+        are included in the dump and logged, as they need to be stored with
+        .set_by_path. With a journal the handed out values are journaled.
+        """
+        handed_out, self._handed_out = self._handed_out, set()
+        if self.journal_size:
+            if handed_out and not self._journal_pending:
+                # the fragments are updated on a compaction only, journal the
+                #  handed out values instead of comparing them
+                for path in handed_out:
+                    if path[0] in self.config:
+                        self._mark_dirty(list(path))
+            return
+
+        if not handed_out or self._dirty:
+            return
+
+        fragments = dict(self._fragments)
+        self._dirty.update(path for path in handed_out
+                           if path[0] in self.config)
+        changed = [top for top in self._update_fragments()
+                   if self._fragments.get(top) != fragments.get(top)]
+        if not changed:
+            return
+
+        self.logger.warning(
+            '%s: %s changed in place without .set_by_path, store the changes '
+            'with .set_by_path', self.filename, ', '.join(sorted(changed)))
+        for top in changed:
+            # let the dump encode the entry again and detect the change
+            if top in fragments:
+                self._fragments[top] = fragments[top]
+            else:
+                self._fragments.pop(top, None)
+            self._subfragments.pop(top, None)
+            self._mark_dirty([top])
+
+    def _append_journal(self):
+        """append the touched subtrees as set or pop entrys to the journal
+
+        Raises:
+            IOError: the journal can not be written
+            TypeError: the config can not be formated as json
+        """
+        pending, self._journal_pending = self._journal_pending, set()
+        lines = []
         try:
-            current_state = json.dumps(self.config, indent=2, sort_keys=True)
-            return current_state != self._last_dump
+            for path in pending:
+                if len(path) > 1 and (path[0],) in pending:
+                    # the whole top level entry is journaled
+                    continue
+                try:
+                    value = self._get_by_path(self.config, list(path))
+                except (KeyError, TypeError):
+                    entry = ["pop", path]
+                else:
+                    entry = ["set", path, value]
+                lines.append(json.dumps(entry, separators=(',', ':')))
+        except TypeError:
+            # retry the encoding on the next save
+            self._journal_pending.update(pending)
+            raise
+
+        if not lines:
+            return
+        data = '\n'.join(lines) + '\n'
+        with open(self._journal_filename, 'a') as file:
+            file.write(data)
+        self._journal_bytes += len(data)
 
+    def _replay_journal(self):
+        """apply the entrys of existing journal files to .config
+
+        Returns:
+            int, the number of applied entrys
+        """
+        applied = 0
+        for path in (self._journal_filename + '.1', self._journal_filename):
+            try:
+                with open(path) as file:
+                    lines = file.readlines()
+            except IOError:
+                continue
+
+            for line_no, line in enumerate(lines, 1):
+                try:
+                    entry = json.loads(line)
+                    if entry[0] == "set":
+                        self.set_by_path(entry[1], entry[2])
+                    else:
+                        self.pop_by_path(entry[1])
+                except ValueError:
+                    # an interrupted append
+                    self.logger.warning("%s is corrupted at line %s",
+                                        path, line_no)
+                    break
+                except (KeyError, TypeError, IndexError, AttributeError):
+                    self.logger.debug("%s: skipped line %s", path, line_no)
+                    continue
+                applied += 1
+
+        self._journal_pending = set()
+        try:
+            self._journal_bytes = os.path.getsize(self._journal_filename)
+        except OSError:
+            self._journal_bytes = 0
+
+        if applied:
+            self.logger.info("%s: replayed %s journal entrys",
+                             self.filename, applied)
+        return applied
+
+    def _rotate_journal(self):
+        """move the journal aside, a new dump will include all its entrys
+
+        Returns:
+            string, the path of the rotated journal
+        """
+        rotated = self._journal_filename + '.1'
+        self._journal_bytes = 0
+        if not os.path.isfile(self._journal_filename):
+            return rotated
+
+        if os.path.isfile(rotated):
+            # a previous rewrite failed, keep its entrys
+            with open(self._journal_filename) as source:
+                with open(rotated, 'a') as target:
+                    shutil.copyfileobj(source, target)
+            os.remove(self._journal_filename)
+        else:
+            os.replace(self._journal_filename, rotated)
+        return rotated
+
+    @staticmethod
+    def _encode_key(key):
+        """encode a dict key like the json module does
+
+        Args:
+            key: string, integer, float, boolean or None
+
+        Returns:
+            string, the json representation of the key
+        """
+        if isinstance(key, str):
+            return json.dumps(key)
+        return json.dumps(json.dumps(key))
+
+    def _update_fragments(self):
+        """encode the dirty subtrees of .config and update the cached fragments
+
+        Returns:
+            set, the top level keys of the changed fragments
+
+        Raises:
+            TypeError: the config can not be formated as json
+        """
+        dirty, self._dirty = self._dirty, set()
+        changed_tops = set()
+        try:
+            for path in dirty:
+                top = path[0]
+                if len(path) > 1 and (top,) in dirty:
+                    # the whole top level entry is going to be encoded
+                    continue
+
+                if top in self._fragments and self._is_pending(top):
+                    # the fragment is still the raw data from the file
+                    continue
+
+                if top not in self.config:
+                    # the last dump contains the entry also without a cached
+                    #  fragment, e.g. right after a load
+                    self._fragments.pop(top, None)
+                    self._subfragments.pop(top, None)
+                    changed_tops.add(top)
+                    continue
+
+                value = self.config[top]
+                if not isinstance(value, dict):
+                    fragment = self._encode_fragment(value, 1)
+                    self._subfragments.pop(top, None)
+                    if self._fragments.get(top) != fragment:
+                        self._fragments[top] = fragment
+                        changed_tops.add(top)
+                    continue
+
+                cached = self._subfragments.get(top)
+                if cached is None or top not in self._fragments:
+                    cached = self._subfragments[top] = {}
+                    keys = list(value)
+                    changed_tops.add(top)
+                elif len(path) == 1:
+                    keys = set(value).union(cached)
+                else:
+                    keys = path[1:]
+
+                for key in keys:
+                    if key not in value:
+                        if cached.pop(key, None) is not None:
+                            changed_tops.add(top)
+                        continue
+                    fragment = self._encode_fragment(value[key], 2)
+                    if cached.get(key) != fragment:
+                        cached[key] = fragment
+                        changed_tops.add(top)
         except TypeError:
-            # currupt config
-            return True
+            # retry the encoding on the next dump
+            self._dirty.update(dirty)
+            raise
 
-    def _make_failsafe_backup(self):
-        """remove old backup files above the limit and create a new backup
+        for top in changed_tops:
+            cached = self._subfragments.get(top)
+            if cached is None:
+                continue
+            self._fragments[top] = self._join_fragments(cached, 1)
+
+        return changed_tops
 
-        the limit refers to the number of .failsafe_backups
+    def _encode_fragment(self, value, level):
+        """encode a subtree of .config in the format of the .serializer
+
+        Args:
+            value: any type, a json serializable object
+            level: int, the depth of the subtree in .config
 
         Returns:
-            boolean, True on a successful new backup, otherwise False
+            string, the json formated value
+
+        Raises:
+            TypeError: the value can not be formated as json
+        """
+        if self.serializer == 'pretty':
+            return json.dumps(value, indent=2, sort_keys=True).replace(
+                '\n', '\n' + '  ' * level)
+        return compact_dumps(value)
+
+    def _join_fragments(self, fragments, level):
+        """join encoded values to a json formated dict
+
+        the pretty format sorts all keys, the compact formats only sort the
+        top level keys, place them on separate lines and keep the order of the
+        dicts in .config
+
+        Args:
+            fragments: dict, keys with their encoded values
+            level: int, the depth of the dict in .config
+
+        Returns:
+            string, the json formated dict
+        """
+        if not fragments:
+            return '{}'
+        if self.serializer == 'pretty':
+            indent = '  ' * level
+            return '{\n%s\n%s}' % (',\n'.join(
+                '%s  %s: %s' % (indent, self._encode_key(key), fragments[key])
+                for key in sorted(fragments)), indent)
+
+        if level == 0:
+            # one entry per line allows to split the file into sections
+            return '{\n%s\n}' % ',\n'.join(
+                '%s:%s' % (self._encode_key(key), fragments[key])
+                for key in sorted(fragments))
+        return '{%s}' % ','.join(
+            '%s:%s' % (self._encode_key(key), fragments[key])
+            for key in fragments)
+
+    def _dumps(self, fragments=None):
+        """join the cached fragments to a json formated string
+
+        Args:
+            fragments: dict, a snapshot of .fragments, defaults to the current
+
+        Returns:
+            string, for the pretty format the same output as
+                json.dumps(.config, indent=2, sort_keys=True) would produce
+        """
+        if fragments is None:
+            fragments = self._fragments
+        return self._join_fragments(fragments, 0)
+
+    def _write_file(self, data):
+        """replace the file on disk atomically with the given data
+
+        Args:
+            data: string, the new file content, gets compressed for the gzip
+                format
+
+        Raises:
+            IOError: the file can not be written to the configured path
+        """
+        payload = data.encode()
+        if self.serializer == 'gzip':
+            payload = gzip.compress(payload, compresslevel=6)
+
+        tmp_filename = self.filename + '.tmp'
+        with open(tmp_filename, 'wb') as file:
+            file.write(payload)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_filename, self.filename)
+
+    def _dump_to_file(self, seq, fragments, start_time, cleanup=()):
+        """join the snapshot of fragments and write it to file
+
+        Args:
+            seq: int, the sequence number of the snapshot
+            fragments: dict, a snapshot of .fragments
+            start_time: float, timestamp of the save request
+            cleanup: tuple, paths of journal files covered by the snapshot
+
+        Raises:
+            IOError: the config can not be saved to the configured path
+        """
+        with self._dump_lock:
+            if seq < self._dump_seq:
+                # a newer snapshot is already scheduled
+                self.logger.debug("%s discard stale dump %s",
+                                  self.filename, seq)
+                return
+
+            dump = self._dumps(fragments)
+            if dump != self._last_dump:
+                if self.failsafe_backups:
+                    self._make_failsafe_backup()
+
+                try:
+                    self._write_file(dump)
+                except IOError:
+                    # force a new dump on the next save
+                    self._last_dump = None
+                    raise
+                self._last_dump = dump
+                self._remember_file(dump)
+
+            self._remove_files(cleanup)
+
+        interval = time.time() - start_time
+        self.logger.info("%s write %s", self.filename, interval)
+        if self.audit is not None:
+            self.audit.record_dump(self.filename, interval)
+
+    def _read_file(self, path=None):
+        """read a plain or gzip compressed file
+
+        the compression is detected by content to allow format changes
+
+        Args:
+            path: string, the file to read, defaults to .filename
+
+        Returns:
+            string, the decoded file content
+
+        Raises:
+            IOError: the file is not readable
+            ValueError: the file is not decodeable
         """
+        with open(path or self.filename, 'rb') as file:
+            data = file.read()
+        if data.startswith(_GZIP_MAGIC):
+            try:
+                data = gzip.decompress(data)
+            except (OSError, EOFError) as err:
+                raise ValueError('%s is not decompressable: %s'
+                                 % (path or self.filename, repr(err)))
+        return data.decode()
+
+    def section_sizes(self):
+        """get the encoded size of the top level entrys
+
+        the cached fragments are used, the size of entrys that changed since
+        the last dump is estimated with compact json
+
+        Returns:
+            dict, top level keys with their size in bytes
+        """
+        sizes = {}
+        for key in self.config:
+            if key in self._fragments and (key,) not in self._dirty:
+                sizes[key] = len(self._fragments[key])
+                continue
+            try:
+                sizes[key] = len(compact_dumps(self.config[key]))
+            except TypeError:
+                sizes[key] = -1
+        return sizes
+
+    def _remove_files(self, paths):
+        """remove the given files if they exist
+
+        Args:
+            paths: iterable of strings, file paths
+        """
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _on_dump_done(self, future):
+        """cleanup after a threaded dump and log a failure
+
+        Args:
+            future: concurrent.futures.Future instance
+        """
+        self._pending_dumps.discard(future)
+        if future.cancelled() or future.exception() is None:
+            return
+        self.logger.error("%s write failed: %s",
+                          self.filename, repr(future.exception()))
+
+    def _remember_file(self, data):
+        """store the checksum and stat signature of the current file
+
+        Args:
+            data: string, the file content
+        """
+        self._file_checksum = zlib.crc32(data.encode())
         try:
-            with open(self.filename) as file:
-                json.load(file)
-        except IOError:
+            stat = os.stat(self.filename)
+        except OSError:
+            self._file_signature = None
+        else:
+            self._file_signature = (stat.st_size, stat.st_mtime_ns)
+
+    def _validate_file(self):
+        """check that the current file is valid json
+
+        a file that was not changed since the last read or write is valid
+
+        Returns:
+            boolean, True if the file is valid, otherwise False
+        """
+        try:
+            stat = os.stat(self.filename)
+            if self._file_signature == (stat.st_size, stat.st_mtime_ns):
+                return True
+
+            data = self._read_file()
+            if zlib.crc32(data.encode()) == self._file_checksum:
+                return True
+
+            loads(data)
+        except (IOError, OSError):
             return False
         except ValueError:
             self.logger.warning("%s is corrupted, aborting backup",
                                 self.filename)
             return False
+        return True
+
+    def _make_failsafe_backup(self):
+        """remove old backup files above the limit and create a new backup
+
+        the limit refers to the number of .failsafe_backups, a new backup is
+        skipped if the last one is younger than .failsafe_interval seconds.
+        The backup is a hardlink to the current file, which is replaced and
+        not changed on a write
+
+        Returns:
+            boolean, True on a successful new backup, otherwise False
+        """
+        now = time.time()
+        if now - self._last_backup < self.failsafe_interval:
+            return False
+
+        if not self._validate_file():
+            return False
 
         existing = sorted(glob.glob(self.filename + ".*.bak"))
         while len(existing) > (self.failsafe_backups - 1):
@@ -79,7 +963,16 @@ class Config(collections.MutableMapping):
 
         backup_file = "%s.%s.bak" % (self.filename,
                                      datetime.now().strftime("%Y%m%d%H%M%S"))
-        shutil.copy2(self.filename, backup_file)
+        try:
+            os.link(self.filename, backup_file)
+        except FileExistsError:
+            # there is already a backup from the current second
+            return False
+        except OSError:
+            # hardlinks are not supported
+            shutil.copy2(self.filename, backup_file)
+
+        self._last_backup = now
         return True
 
     def _recover_from_failsafe(self):
@@ -94,8 +987,7 @@ class Config(collections.MutableMapping):
         while existing:
             try:
                 recovery_filename = existing.pop()
-                with open(recovery_filename, 'r') as file:
-                    data = file.read()
+                data = self._read_file(recovery_filename)
                 self._loads(data)
                 self.save(delay=False)
                 self.logger.info("recovered %s successful from %s",
@@ -118,12 +1010,18 @@ class Config(collections.MutableMapping):
                 available
         """
         try:
-            with open(self.filename) as file:
-                data = file.read()
+            data = self._read_file()
             self._loads(data)
             self._last_dump = data
+            self._remember_file(data)
             self.logger.info("%s read", self.filename)
 
+            if self._replay_journal() and not self.journal_size:
+                # the journal is no more in use, merge it into the file
+                self.flush()
+                self._remove_files((self._journal_filename + '.1',
+                                    self._journal_filename))
+
         except IOError:
             if not os.path.isfile(self.filename):
                 self.config = {}
@@ -145,12 +1043,219 @@ class Config(collections.MutableMapping):
         Raises:
             ValueError: the string is not a valid json representing of a dict
         """
-        self.config = json.loads(json_str)
-        asyncio.ensure_future(self.on_reload.fire())
+        sections = None
+        if self.eager_sections is not None:
+            sections = split_sections(json_str)
+        if sections is None:
+            self._set_config(loads(json_str))
+            return
+
+        config = {}
+        pending = {}
+        for key, raw in sections.items():
+            if key in self.eager_sections:
+                config[key] = loads(raw)
+            else:
+                pending[key] = raw
+        self._set_config(LazyDict(config, pending, self._load_section))
+
+        # the raw data is already encoded
+        self._fragments.update(pending)
+        self._dirty.difference_update((key,) for key in pending)
+        self.logger.info("%s: deferred loading of %s", self.filename,
+                         ', '.join(sorted(pending)) or '-')
+
+    def _load_section(self, key, raw):
+        """parse a top level entry on first access
+
+        Args:
+            key: string, top level key
+            raw: string, the json formated value
+
+        Returns:
+            any type, the parsed value
+
+        Raises:
+            ValueError: the raw data is not valid json
+        """
+        value = loads(raw)
+        self.logger.debug("%s: loaded %s", self.filename, key)
+        return value
+
+    def _is_pending(self, key):
+        """check weather a top level entry is not yet loaded
+
+        Args:
+            key: string, top level key
+
+        Returns:
+            boolean, True if the entry is parsed on first access
+        """
+        return key in getattr(self.config, 'pending', ())
+
+    def _set_config(self, config):
+        """replace the config and reset the cached fragments
+
+        Args:
+            config: dict, the new config
+        """
+        changed = diff_keys(self.config, config)
+        self.config = config
+        self._fragments = {}
+        self._subfragments = {}
+        self._dirty = set()
+        self._mark_dirty([])
+        self._invalidate_options()
+        asyncio.ensure_future(self.on_reload.fire(changed))
+
+    def _read_changes(self, last_dump):
+        """read the file and compare it with the last known file content
+
+        Args:
+            last_dump: string, the content of the last read or write
+
+        Returns:
+            tuple, the file content, the parsed config and a list of changed
+                top level keys, the keys are None if the previous content is
+                unknown
+
+        Raises:
+            IOError: the file is not readable
+            ValueError: the file is not a valid json representing of a dict
+        """
+        data = self._read_file()
+        if data == last_dump:
+            return data, None, []
+
+        config = loads(data)
+        if not isinstance(config, dict):
+            raise ValueError('%s does not contain a dict' % self.filename)
+        if last_dump is None:
+            return data, config, None
+        return data, config, diff_keys(loads(last_dump), config)
+
+    async def reload_changes(self):
+        """apply external changes of the file to .config
+
+        only the top level entrys that changed on disk since the last read or
+        write are replaced, unsaved changes of other entrys are kept
+
+        Returns:
+            list, the replaced top level keys
+
+        Raises:
+            IOError: the file is not readable
+            ValueError: the file is not a valid json representing of a dict
+        """
+        try:
+            stat = os.stat(self.filename)
+        except OSError:
+            return []
+        if (self._file_signature == (stat.st_size, stat.st_mtime_ns)
+                or self._pending_dumps):
+            return []
+
+        last_dump = self._last_dump
+        data, config, changed = await asyncio.get_event_loop().run_in_executor(
+            None, self._read_changes, last_dump)
+        if self._last_dump is not last_dump or self._pending_dumps:
+            # a dump happened meanwhile, check again on the next call
+            return []
+
+        if changed is None:
+            changed = diff_keys(self.config, config)
+
+        for key in changed:
+            if key in config:
+                self.config[key] = config[key]
+            else:
+                self.config.pop(key, None)
+            self._mark_dirty([key])
+
+        self._last_dump = data
+        self._remember_file(data)
+        if not changed:
+            return []
+
+        self.logger.info("%s reloaded: %s", self.filename, ', '.join(changed))
+        self._invalidate_options(changed)
+        asyncio.ensure_future(self.on_reload.fire(changed))
+        return changed
+
+    async def watch(self, interval):
+        """reload the file periodically if it was changed on disk
+
+        Args:
+            interval: float, time in seconds between two checks
+        """
+        last_error = None
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.reload_changes()
+            except (IOError, ValueError) as err:
+                if repr(err) != last_error:
+                    # the file might be in an intermediate state of an edit
+                    self.logger.warning("%s: reload failed: %s",
+                                        self.filename, repr(err))
+                last_error = repr(err)
+            else:
+                last_error = None
+
+    def transaction(self):
+        """defer calls of .save until the outermost transaction ends
+
+        usage:
+            with bot.memory.transaction():
+                ...
+            async with bot.memory.transaction():
+                ...
+
+        Note: an `async with` transaction also defers the saves of other
+            tasks while it awaits
+
+        Returns:
+            Transaction instance
+        """
+        return Transaction(self)
+
+    def _begin_transaction(self):
+        """enter a transaction"""
+        self._transaction_depth += 1
+
+    def _end_transaction(self):
+        """leave a transaction and run a deferred save on the outermost exit
+
+        Raises:
+            IOError: the config can not be saved to the configured path
+            ValueError: the config can not be formated as json
+        """
+        self._transaction_depth -= 1
+        if self._transaction_depth or self._deferred_save is None:
+            return
+        delay, self._deferred_save = self._deferred_save, None
+        self._save(delay=delay)
+
+    def _defer_save(self, delay):
+        """remember a save request during a transaction
+
+        Args:
+            delay: boolean, the delay argument of the save request
+
+        Returns:
+            boolean, True if the save is deferred, otherwise False
+        """
+        if not self._transaction_depth:
+            return False
+        # an immediate save request takes precedence
+        self._deferred_save = bool(delay) and self._deferred_save is not False
+        return True
 
     def save(self, delay=True):
         """dump the cached data to file
 
+        a threaded save logs write errors instead of raising them
+
         Args:
             delay: boolean, set to False to force an immediate dump
 
@@ -158,38 +1263,134 @@ class Config(collections.MutableMapping):
             IOError: the config can not be saved to the configured path
             ValueError: the config can not be formated as json
         """
+        if self.audit is not None:
+            # the save may run later, remember who asked for it
+            self._save_callers.add(self.audit.find_caller())
+        self._save(delay)
+
+    def _save(self, delay):
+        """run or schedule a requested save
+
+        Args:
+            delay: boolean, set to False to force an immediate dump
+
+        Raises:
+            IOError: the config can not be saved to the configured path
+            ValueError: the config can not be formated as json
+        """
+        if self._defer_save(delay):
+            return
+
         if self._timer_save is not None:
             self._timer_save.cancel()
 
+        # objects handed out might have been changed in place
+        self._invalidate_options()
+
         if self.save_delay and delay:
             self._timer_save = asyncio.get_event_loop().call_later(
-                self.save_delay, self.save, False)
+                self.save_delay, self._save, False)
             return
 
+        self._record_save()
+        self._mark_removed()
+        self._check_in_place()
+
         if not self._changed:
             # skip dumping as the file is already up to date
             return
 
         start_time = time.time()
 
-        if self.failsafe_backups:
-            self._make_failsafe_backup()
+        cleanup = ()
+        if self.journal_size:
+            self._append_journal()
+            if (self._last_dump is not None
+                    and self._journal_bytes < self.journal_size):
+                return
 
-        self._last_dump = json.dumps(self.config, indent=2, sort_keys=True)
-        with open(self.filename, 'w') as file:
-            file.write(self._last_dump)
+            if self._compaction is not None and not self._compaction.done():
+                # wait for the running rewrite, the journal keeps all changes
+                return
 
-        interval = time.time() - start_time
-        self.logger.info("%s write %s", self.filename, interval)
+            self.logger.info("%s: compacting the journal", self.filename)
+            cleanup = (self._rotate_journal(),)
+
+        self._dump(start_time, cleanup)
+
+    def _record_save(self):
+        """count the running save once for each caller that requested it"""
+        callers, self._save_callers = self._save_callers, set()
+        if self.audit is None:
+            return
+        for caller in callers:
+            self.audit.record('save', caller=caller)
+
+    def _dump(self, start_time, cleanup=()):
+        """encode the touched subtrees and write the file
+
+        Args:
+            start_time: float, timestamp of the save request
+            cleanup: tuple, paths of journal files covered by the new dump
+
+        Raises:
+            IOError: the config can not be saved to the configured path
+            ValueError: the config can not be formated as json
+        """
+        if not self._update_fragments() and self._last_dump is not None:
+            # the touched subtrees did not change
+            self._remove_files(cleanup)
+            return
+
+        self._dump_seq += 1
+        # the fragments are immutable strings, a shallow copy is a snapshot
+        args = (self._dump_seq, dict(self._fragments), start_time, cleanup)
+
+        if not self.threaded_save:
+            self._dump_to_file(*args)
+            return
+
+        self._compaction = self._run_in_worker(self._dump_to_file, *args)
+
+    def _run_in_worker(self, func, *args):
+        """run a write operation in the worker thread
+
+        the single worker executes the calls in the order of submission
+
+        Args:
+            func: callable, the write operation
+            args: tuple, positional arguments for the func
+
+        Returns:
+            concurrent.futures.Future instance
+        """
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=1)
+        future = self._executor.submit(func, *args)
+        self._pending_dumps.add(future)
+        future.add_done_callback(self._on_dump_done)
+        return future
 
     def flush(self):
-        """force an immediate dump to file"""
+        """force an immediate dump to file and wait for pending writes
+
+        the dump happens also inside of a transaction
+        """
         self.logger.info("flushing %s", self.filename)
-        self.save(delay=False)
+        depth, self._transaction_depth = self._transaction_depth, 0
+        try:
+            self.save(delay=False)
+        finally:
+            self._transaction_depth = depth
+        concurrent.futures.wait(list(self._pending_dumps))
 
     def get_by_path(self, keys_list, fallback=True):
         """Get an item from .config by path
 
+        a dict or list that is changed in place needs to be stored with
+        .set_by_path to be included in the next dump, see ._check_in_place
+
         Args:
             keys_list: list, a list of strings, describing the path to the value
             fallback: boolean, use the default values as fallback for missing
@@ -202,7 +1403,7 @@ class Config(collections.MutableMapping):
             KeyError, ValueError: the path does not exist
         """
         try:
-            return self._get_by_path(self.config, keys_list)
+            value = self._get_by_path(self.config, keys_list)
         except (KeyError, ValueError):
             if not fallback:
                 raise
@@ -212,6 +1413,11 @@ class Config(collections.MutableMapping):
                 raise KeyError('%s has no path %s and there is no default set' %
                                (self.logger.name, keys_list))
 
+        self._hand_out(keys_list, value)
+        if self.audit is not None:
+            self.audit.record('get', keys_list)
+        return value
+
     def set_by_path(self, keys_list, value, create_path=True):
         """set an item in .config by path
 
@@ -225,8 +1431,11 @@ class Config(collections.MutableMapping):
         """
         if create_path:
             self.ensure_path(keys_list)
-        self.get_by_path(keys_list[:-1],
-                         fallback=False)[keys_list[-1]] = value
+        self._get_by_path(self.config, keys_list[:-1])[keys_list[-1]] = value
+        self._mark_dirty(keys_list)
+        self._invalidate_options()
+        if self.audit is not None:
+            self.audit.record('set', keys_list, value)
 
     def pop_by_path(self, keys_list):
         """remove an item in .config found with the given path
@@ -240,7 +1449,13 @@ class Config(collections.MutableMapping):
         Raises:
             KeyError, ValueError: the path does not exist
         """
-        return self.get_by_path(keys_list[:-1], False).pop(keys_list[-1])
+        value = self._get_by_path(self.config, keys_list[:-1]).pop(
+            keys_list[-1])
+        self._mark_dirty(keys_list)
+        self._invalidate_options()
+        if self.audit is not None:
+            self.audit.record('pop', keys_list)
+        return value
 
     @staticmethod
     def _get_by_path(source, path):
@@ -259,7 +1474,7 @@ class Config(collections.MutableMapping):
             return source
         return functools.reduce(operator.getitem, path[:-1], source)[path[-1]]
 
-    def get_option(self, keyname):
+    def _resolve_option(self, keyname):
         """get a top level entry from config or a default value
 
         Args:
@@ -273,6 +1488,28 @@ class Config(collections.MutableMapping):
         except KeyError:
             return self.default
 
+    def get_option(self, keyname):
+        """get a top level entry from config or a default value
+
+        the result is cached until the config changes
+
+        Args:
+            keyname: string, top level key
+
+        Returns:
+            any type, the requested value or .default if the key does not exist
+        """
+        try:
+            value = self._option_cache[(keyname,)]
+        except KeyError:
+            self._option_misses[keyname] += 1
+            value = self._option_cache[(keyname,)] = self._resolve_option(
+                keyname)
+        else:
+            self._option_hits[keyname] += 1
+            self._hand_out([keyname], value)
+        return value
+
     def get_suboption(self, grouping, groupname, keyname):
         """get a third level entry from config with a fallback to top level
 
@@ -286,10 +1523,20 @@ class Config(collections.MutableMapping):
             any type, the requested value, it's fallback on top level or
                 .default if the key does not exist on both level
         """
+        path = (grouping, groupname, keyname)
         try:
-            return self.get_by_path([grouping, groupname, keyname])
+            value = self._option_cache[path]
         except KeyError:
-            return self.get_option(keyname)
+            self._option_misses[keyname] += 1
+            try:
+                value = self.get_by_path(list(path))
+            except KeyError:
+                value = self._resolve_option(keyname)
+            self._option_cache[path] = value
+        else:
+            self._option_hits[keyname] += 1
+            self._hand_out(path, value)
+        return value
 
     def exists(self, keys_list, fallback=False):
         """check if a path exisits in the dict
@@ -303,7 +1550,14 @@ class Config(collections.MutableMapping):
             boolean, True if the full path is resolvable, otherwise False
         """
         try:
-            self.get_by_path(keys_list, fallback)
+            self._get_by_path(self.config, keys_list)
+            return True
+        except (KeyError, TypeError):
+            if not fallback:
+                return False
+
+        try:
+            self._get_by_path(self.defaults, keys_list)
             return True
         except (KeyError, TypeError):
             return False
@@ -322,9 +1576,13 @@ class Config(collections.MutableMapping):
             AttributeError: on attempting to override a key pointing to an entry
                 in config that is not a dict
         """
+        created = not self.exists(path)
         if base is None:
             base = self.config
-        created = not self.exists(path)
+            if created:
+                self._mark_dirty(path)
+        if created:
+            self._invalidate_options()
         last_key = None
         for level in path:
             try:
@@ -354,6 +1612,7 @@ class Config(collections.MutableMapping):
             path = []
         else:
             self.ensure_path(path, base=self.defaults)
+        self._invalidate_options()
         defaults = self._get_by_path(self.defaults, path)
         for key, value in source.items():
             if key not in defaults:
@@ -393,9 +1652,13 @@ class Config(collections.MutableMapping):
 
     def __setitem__(self, key, value):
         self.config[key] = value
+        self._mark_dirty([key])
+        self._invalidate_options()
 
     def __delitem__(self, key):
         del self.config[key]
+        self._mark_dirty([key])
+        self._invalidate_options()
 
     def __iter__(self):
         return iter(self.config)
@@ -404,7 +1667,8 @@ class Config(collections.MutableMapping):
         return len(self.config)
 
     def force_taint(self):
-        """[DEPRECATED] toggle the changed state to True"""
-        self.logger.warning(('[DEPRECATED] .force_taint is no more needed to '
-                             'mark the config for a needed dump.'),
+        """[DEPRECATED] mark the whole config for the next dump"""
+        self.logger.warning(('[DEPRECATED] .force_taint dumps the whole config, '
+                             'store changes with .set_by_path instead.'),
                             stack_info=True)
+        self._mark_dirty([])
@@ -0,0 +1,169 @@
+"""attribute memory access and saves to the calling plugin"""
+
+import collections
+import json
+import sys
+import threading
+
+import plugins
+
+from config import compact_dumps
+
+# modules of the storage, skipped during the caller lookup
+STORAGE_MODULES = ('config', 'config_sharded', 'config_sqlite', __name__)
+
+# upper limits of the dump time histogram in seconds
+DUMP_TIME_BUCKETS = (0.001, 0.01, 0.1, 1, 10)
+
+
+def find_caller():
+    """find the plugin or module that accesses the storage
+
+    a loaded plugin in the call stack takes precedence over core modules
+
+    Returns:
+        string, the module path of the plugin or the first module outside of
+            the storage
+    """
+    loaded = plugins.tracking.list
+    frame = sys._getframe(1)                 # pylint:disable=protected-access
+    fallback = None
+    while frame is not None:
+        module = frame.f_globals.get('__name__') or ''
+        if module not in STORAGE_MODULES:
+            if fallback is None:
+                fallback = module
+            # include submodules of a plugin package
+            package = module
+            while package:
+                if package in loaded:
+                    return package
+                package = package.rpartition('.')[0]
+        frame = frame.f_back
+    return fallback or 'unknown'
+
+
+def _bucket_label(seconds):
+    """get the histogram bucket for a dump time
+
+    Args:
+        seconds: float, the dump time
+
+    Returns:
+        string, the label of the bucket
+    """
+    for limit in DUMP_TIME_BUCKETS:
+        if seconds < limit:
+            return '<%ss' % limit
+    return '>=%ss' % DUMP_TIME_BUCKETS[-1]
+
+
+class AccessAudit(object):
+    """collect access counts, written bytes and dump times of a Config
+
+    assign an instance to Config.audit to start the recording
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.operations = collections.Counter()
+        self.keys = collections.Counter()
+        self.written = collections.Counter()
+        self.dump_times = collections.Counter()
+
+    def reset(self):
+        """clear the recorded data"""
+        with self._lock:
+            self.operations.clear()
+            self.keys.clear()
+            self.written.clear()
+            self.dump_times.clear()
+
+    @staticmethod
+    def find_caller():
+        """find the plugin or module that accesses the storage
+
+        Returns:
+            string, see find_caller
+        """
+        return find_caller()
+
+    def record(self, operation, path=None, value=None, caller=None):
+        """count an access of the storage
+
+        Args:
+            operation: string, 'get', 'set', 'pop' or 'save'
+            path: list, the accessed path
+            value: any type, the new value of a 'set'
+            caller: string, the plugin or module that requested the access,
+                None to look it up in the call stack
+        """
+        if caller is None:
+            caller = find_caller()
+        with self._lock:
+            self.operations[(caller, operation)] += 1
+            if not path:
+                return
+            top = str(path[0])
+            self.keys[(caller, top, operation)] += 1
+            if operation != 'set':
+                return
+            try:
+                self.written[(caller, top)] += len(compact_dumps(value))
+            except TypeError:
+                # the save is going to fail and report it
+                pass
+
+    def record_dump(self, filename, seconds):
+        """add a dump time to the histogram
+
+        Args:
+            filename: string, the written file
+            seconds: float, time the dump took
+        """
+        with self._lock:
+            self.dump_times[(filename, _bucket_label(seconds))] += 1
+
+    def report(self, storage=None):
+        """summarize the recorded data
+
+        Args:
+            storage: config.Config instance, add the size of its top level
+                entrys
+
+        Returns:
+            dict, json serializable summary
+        """
+        with self._lock:
+            operations = {}
+            for (caller, operation), count in self.operations.items():
+                operations.setdefault(caller, {})[operation] = count
+
+            keys = {}
+            for (caller, top, operation), count in self.keys.items():
+                keys.setdefault(caller, {}).setdefault(top, {})[
+                    operation] = count
+            for (caller, top), size in self.written.items():
+                keys.setdefault(caller, {}).setdefault(top, {})[
+                    'bytes_written'] = size
+
+            dumps = {}
+            for (filename, label), count in self.dump_times.items():
+                dumps.setdefault(filename, {})[label] = count
+
+        result = {'operations': operations, 'keys': keys, 'dumps': dumps}
+        if storage is not None:
+            result['sections'] = storage.section_sizes()
+        return result
+
+    def dump(self, path, storage=None):
+        """write the report to a json file
+
+        Args:
+            path: string, target file
+            storage: config.Config instance, see .report
+
+        Raises:
+            IOError: the file can not be written
+        """
+        with open(path, 'w') as file:
+            json.dump(self.report(storage), file, indent=2, sort_keys=True)
@@ -0,0 +1,304 @@
+"""memory storage with one json file per top level entry"""
+
+import asyncio
+import concurrent.futures
+import os
+import urllib.parse
+
+from config import Config, LazyDict, loads
+
+
+class ShardedConfig(Config):
+    """Config that stores each top level entry in a separate file
+
+    every shard is a Config instance with its own dump tracking
+    and failsafe backups. The shard files are placed in a directory next to
+    the path, e.g. memory.json -> memory.d/user_data.json
+
+    Args:
+        path: string, file path of the unsharded file, used for the migration
+        eager_sections: tuple, top level keys to load on start, the shards of
+            other keys are loaded on first access, None to load all on start
+        kwargs: dict, arguments for each shard, see config.Config
+    """
+    def __init__(self, path, eager_sections=None, **kwargs):
+        # a save request is delayed once for all shards
+        super().__init__(path, save_delay=kwargs.get('save_delay', 0),
+                         eager_sections=eager_sections)
+        self.directory = os.path.splitext(path)[0] + '.d'
+        self.shards = {}
+        self._shard_kwargs = kwargs
+        # keys of shard files that are loaded on first access
+        self._deferred_keys = set()
+
+    @property
+    def _changed(self):
+        """return weather any shard changed since its last dump
+
+        Returns:
+            boolean, True if a shard needs a dump, otherwise False
+        """
+        return any(shard._changed for shard in self.shards.values())
+
+    def _shard_filename(self, key):
+        """get the file path of the shard for a top level key
+
+        Args:
+            key: string, top level key
+
+        Returns:
+            string, the path
+        """
+        return os.path.join(self.directory,
+                            urllib.parse.quote(str(key), safe='') + '.json')
+
+    def _get_shard(self, key):
+        """get or create the shard of a top level key
+
+        Args:
+            key: string, top level key
+
+        Returns:
+            config.Config instance
+        """
+        if key not in self.shards:
+            shard = Config(self._shard_filename(key), **self._shard_kwargs)
+            shard.logger = self.logger
+            shard.audit = self.audit
+            self.shards[key] = shard
+        return self.shards[key]
+
+    def _sync_shard(self, key):
+        """link the shard data to the current top level entry
+
+        Args:
+            key: string, top level key
+
+        Returns:
+            config.Config instance, the shard of the key
+        """
+        shard = self._get_shard(key)
+        if key not in self.config:
+            if shard.config:
+                shard.config = {}
+        elif shard.config.get(key) is not self.config[key]:
+            shard.config = {key: self.config[key]}
+        return shard
+
+    def _mark_dirty(self, path):
+        """forward the subtree tracking to the affected shards
+
+        Args:
+            path: list, a list of strings, describing the path to the value
+        """
+        keys = [path[0]] if path else set(self.config).union(self.shards)
+        for key in keys:
+            if len(path) < 2 and key not in self.config:
+                self._remove_shard(key)
+                continue
+            shard = self._sync_shard(key)
+            shard._mark_dirty(path or [key])
+
+    def _remove_shard(self, key):
+        """drop the shard of a deleted top level key and remove its files
+
+        Args:
+            key: string, top level key
+        """
+        self._deferred_keys.discard(key)
+        shard = self.shards.pop(key, None)
+        if shard is not None:
+            if shard._timer_save is not None:
+                shard._timer_save.cancel()
+            # a running write would recreate the file
+            concurrent.futures.wait(list(shard._pending_dumps))
+
+        filename = self._shard_filename(key)
+        if not os.path.isfile(filename):
+            return
+        self._remove_files((filename, filename + '.journal.1',
+                            filename + '.journal'))
+        self.logger.info("%s: removed the shard of %s", self.directory, key)
+
+    def _check_in_place(self):
+        """[compat] let the shards check handed out values for changes
+
+        see config.Config._check_in_place
+        """
+        handed_out, self._handed_out = self._handed_out, set()
+        if not handed_out or self._changed:
+            return
+        keys = set()
+        for path in handed_out:
+            if path[0] in self.config:
+                self._sync_shard(path[0])._handed_out.add(path)
+                keys.add(path[0])
+        for key in keys:
+            self.shards[key]._check_in_place()
+
+    def _stored_sections(self):
+        """get the top level keys that have a shard
+
+        Returns:
+            set of strings
+        """
+        return set(self.shards).union(self._deferred_keys)
+
+    def load(self):
+        """load all shards, migrate the unsharded file if no shard exists
+
+        Raises:
+            IOError: a shard is not readable or can not be created
+            ValueError: a shard is not valid json and no backup is available
+        """
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+        names = [name for name in os.listdir(self.directory)
+                 if name.endswith('.json')]
+
+        if not names and os.path.isfile(self.filename):
+            self._migrate()
+            return
+
+        def _read(shard):
+            """read and parse a shard file
+
+            Args:
+                shard: config.Config instance
+
+            Returns:
+                tuple, file content and the parsed data or (None, None)
+            """
+            try:
+                data = shard._read_file()
+                return data, loads(data)
+            except (IOError, ValueError):
+                return None, None
+
+        keys = [urllib.parse.unquote(name[:-5]) for name in names]
+        pending = {}
+        if self.eager_sections is not None:
+            pending = {key: self._shard_filename(key) for key in keys
+                       if key not in self.eager_sections}
+            keys = [key for key in keys if key not in pending]
+        shards = [self._get_shard(key) for key in keys]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(_read, shards))
+
+        config = {}
+        for key, shard, (data, parsed) in zip(keys, shards, results):
+            if parsed is None:
+                # let the shard handle the recovery
+                shard.load()
+            else:
+                shard._set_config(parsed)
+                shard._last_dump = data
+                shard._remember_file(data)
+                shard._replay_journal()
+            if key in shard.config:
+                config[key] = shard.config[key]
+
+        self._deferred_keys = set(pending)
+        if pending:
+            config = LazyDict(config, pending, self._load_section)
+        self.config = config
+        self.logger.info("%s read %s shards, deferred %s", self.directory,
+                         len(shards), len(pending))
+        asyncio.ensure_future(self.on_reload.fire())
+
+    def _load_section(self, key, path):
+        """load the shard of a top level key on first access
+
+        Args:
+            key: string, top level key
+            path: string, the shard file
+
+        Returns:
+            any type, the value of the top level entry
+
+        Raises:
+            IOError: the shard is not readable
+            ValueError: the shard is not valid json and no backup is available
+            KeyError: the shard does not contain the key
+        """
+        shard = self._get_shard(key)
+        shard.load()
+        self.logger.debug("%s: loaded %s", path, key)
+        return shard.config[key]
+
+    def _migrate(self):
+        """split the unsharded file into shards"""
+        source = Config(self.filename)
+        source.load()
+        self.config = source.config
+        self._mark_dirty([])
+        self.flush()
+        self.logger.info("%s: split %s into %s shards", self.directory,
+                         self.filename, len(self.shards))
+        asyncio.ensure_future(self.on_reload.fire())
+
+    def section_sizes(self):
+        """get the encoded size of the top level entrys
+
+        Returns:
+            dict, top level keys with their size in bytes
+        """
+        sizes = {}
+        for key in self.config:
+            if key in self.shards:
+                sizes.update(self._sync_shard(key).section_sizes())
+            else:
+                # a deferred shard
+                try:
+                    sizes[key] = os.path.getsize(self._shard_filename(key))
+                except OSError:
+                    sizes[key] = -1
+        return sizes
+
+    def _save(self, delay):
+        """dump the changed shards to file
+
+        the shards are dumped without their own delay, the audit counts the
+        save once, not per changed shard
+
+        Args:
+            delay: boolean, set to False to force an immediate dump
+
+        Raises:
+            IOError: a shard can not be saved
+            ValueError: a shard can not be formated as json
+        """
+        if self._defer_save(delay):
+            return
+
+        if self._timer_save is not None:
+            self._timer_save.cancel()
+
+        # objects handed out might have been changed in place
+        self._invalidate_options()
+
+        if self.save_delay and delay:
+            self._timer_save = asyncio.get_event_loop().call_later(
+                self.save_delay, self._save, False)
+            return
+
+        self._record_save()
+        self._mark_removed()
+        self._check_in_place()
+
+        for key in list(self.shards):
+            shard = self.shards[key]
+            if shard._changed:
+                self._sync_shard(key)._save(False)
+
+    def flush(self):
+        """force an immediate dump of all shards"""
+        depth, self._transaction_depth = self._transaction_depth, 0
+        try:
+            self.save(delay=False)
+        finally:
+            self._transaction_depth = depth
+        # the changed shards are dumped above, wait for their writes
+        for shard in self.shards.values():
+            concurrent.futures.wait(list(shard._pending_dumps))
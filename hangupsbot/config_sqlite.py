@@ -0,0 +1,327 @@
+"""memory storage in a SQLite database with row level writes"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+from config import Config, LazyDict, loads
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS sections ("
+    " name TEXT PRIMARY KEY,"
+    " value TEXT)",
+    "CREATE TABLE IF NOT EXISTS rows ("
+    " section TEXT NOT NULL,"
+    " key TEXT NOT NULL,"
+    " value TEXT NOT NULL,"
+    " PRIMARY KEY (section, key))",
+)
+
+
+def _signature(encoded):
+    """get a compact fingerprint of a stored value
+
+    Args:
+        encoded: string, the json formated value
+
+    Returns:
+        tuple, the size in bytes and the md5 digest of the value
+    """
+    data = encoded.encode()
+    return len(data), hashlib.md5(data).digest()
+
+
+class SQLiteConfig(Config):
+    """Config with a SQLite database as storage
+
+    the entrys of the .row_sections are stored as single rows, any other top
+    level entry is stored as a whole. All data is kept in .config as cache,
+    the stored rows are tracked by their size and digest only.
+
+    Note: .failsafe_backups is not used, a write is a single transaction
+
+    Args:
+        path: string, file path of the database
+        migrate_from: string, path of a json file to import into a new database
+        kwargs: dict, see config.Config
+    """
+    row_sections = ('user_data', 'conv_data', 'convmem')
+
+    def __init__(self, path, migrate_from=None, **kwargs):
+        kwargs.pop('journal_size', None)
+        super().__init__(path, **kwargs)
+        self.migrate_from = migrate_from
+        self._connection = None
+        self._rows = {}
+
+    @property
+    def _changed(self):
+        """return weather the config changed since the last write
+
+        Returns:
+            boolean, True if a subtree was touched since the last write,
+                otherwise False
+        """
+        return bool(self._dirty)
+
+    @staticmethod
+    def _encode_value(value):
+        """encode a value for the storage
+
+        Args:
+            value: any type, a json serializable object
+
+        Returns:
+            string, compact json
+        """
+        return json.dumps(value, separators=(',', ':'), sort_keys=True)
+
+    def _connect(self):
+        """open the database and create the tables if missing
+
+        Raises:
+            sqlite3.Error: the database is not accessible
+        """
+        if self._connection is not None:
+            return
+        self._connection = sqlite3.connect(self.filename,
+                                           check_same_thread=False)
+        with self._connection:
+            for statement in SCHEMA:
+                self._connection.execute(statement)
+
+    def load(self):
+        """Load the data from the database
+
+        a new database is populated with the data of .migrate_from, if set
+
+        Raises:
+            sqlite3.Error: the database is not accessible
+            ValueError: the json file to migrate from is not valid
+        """
+        self._connect()
+        empty = (self._connection.execute(
+            "SELECT COUNT(*) FROM sections").fetchone()[0] == 0)
+
+        if empty and self.migrate_from and os.path.isfile(self.migrate_from):
+            self._migrate(self.migrate_from)
+            return
+
+        config = {}
+        pending = {}
+        self._rows = {}
+        for name, value in self._connection.execute(
+                "SELECT name, value FROM sections"):
+            if value is None:
+                config[name] = {}
+                self._rows[name] = {}
+                continue
+            if (self.eager_sections is None
+                    or name in self.eager_sections):
+                config[name] = loads(value)
+            else:
+                pending[name] = value
+            self._rows[name] = _signature(value)
+
+        for section, key, value in self._connection.execute(
+                "SELECT section, key, value FROM rows"):
+            config.setdefault(section, {})[key] = loads(value)
+            self._rows.setdefault(section, {})[key] = _signature(value)
+
+        if pending:
+            config = LazyDict(config, pending, self._load_section)
+        self.config = config
+        self._dirty = set()
+        self.logger.info("%s read", self.filename)
+        asyncio.ensure_future(self.on_reload.fire())
+
+    def _migrate(self, path):
+        """import a json memory file into the database
+
+        the file is read like a json memory, including a pending journal
+
+        Args:
+            path: string, path of the json file
+
+        Raises:
+            IOError: the file is not readable
+            ValueError: the file is not valid json
+        """
+        source = Config(path)
+        source.logger = self.logger
+        source.load()
+        self.config = source.config
+        self._rows = {}
+        self._mark_dirty([])
+        self._dump(time.time())
+        self.logger.info("%s: imported %s", self.filename, path)
+        asyncio.ensure_future(self.on_reload.fire())
+
+    def _stored_sections(self):
+        """get the top level keys that are stored in the database
+
+        Returns:
+            iterable of strings
+        """
+        return self._rows
+
+    def _check_in_place(self):
+        """[compat] compare handed out values with the stored rows
+
+        a save without dirty paths includes the dicts and lists that were
+        handed out since the last save, only changed rows are written
+        """
+        handed_out, self._handed_out = self._handed_out, set()
+        if not handed_out or self._dirty:
+            return
+        self._dirty.update(path for path in handed_out
+                           if path[0] in self.config)
+
+    def _collect_changes(self):
+        """encode the touched subtrees and compare them with the stored rows
+
+        Returns:
+            list of tuple, (statement, parameters) to write the changes
+
+        Raises:
+            TypeError: the config can not be formated as json
+        """
+        dirty, self._dirty = self._dirty, set()
+        statements = []
+        try:
+            for path in dirty:
+                top = path[0]
+                if len(path) > 1 and (top,) in dirty:
+                    # the whole top level entry is going to be compared
+                    continue
+
+                value = self.config.get(top)
+                if top not in self.config:
+                    if self._rows.pop(top, None) is not None:
+                        statements.append(
+                            ("DELETE FROM sections WHERE name = ?", (top,)))
+                        statements.append(
+                            ("DELETE FROM rows WHERE section = ?", (top,)))
+                    continue
+
+                if top not in self.row_sections or not isinstance(value,
+                                                                  dict):
+                    encoded = self._encode_value(value)
+                    signature = _signature(encoded)
+                    if self._rows.get(top) != signature:
+                        if isinstance(self._rows.get(top), dict):
+                            statements.append(
+                                ("DELETE FROM rows WHERE section = ?", (top,)))
+                        self._rows[top] = signature
+                        statements.append(
+                            ("INSERT OR REPLACE INTO sections VALUES (?, ?)",
+                             (top, encoded)))
+                    continue
+
+                cached = self._rows.get(top)
+                if not isinstance(cached, dict):
+                    cached = self._rows[top] = {}
+                    keys = set(value)
+                    statements.append(
+                        ("INSERT OR REPLACE INTO sections VALUES (?, NULL)",
+                         (top,)))
+                elif len(path) == 1:
+                    keys = set(value).union(cached)
+                else:
+                    keys = path[1:]
+
+                for key in keys:
+                    row_key = key if isinstance(key, str) else json.dumps(key)
+                    if key not in value:
+                        if cached.pop(row_key, None) is not None:
+                            statements.append(
+                                ("DELETE FROM rows WHERE section = ? "
+                                 "AND key = ?", (top, row_key)))
+                        continue
+                    encoded = self._encode_value(value[key])
+                    signature = _signature(encoded)
+                    if cached.get(row_key) != signature:
+                        cached[row_key] = signature
+                        statements.append(
+                            ("INSERT OR REPLACE INTO rows VALUES (?, ?, ?)",
+                             (top, row_key, encoded)))
+        except TypeError:
+            # retry the encoding on the next save
+            self._dirty.update(dirty)
+            raise
+        return statements
+
+    def _write_rows(self, statements, start_time):
+        """execute the statements in a single transaction
+
+        Args:
+            statements: list of tuple, (statement, parameters)
+            start_time: float, timestamp of the save request
+
+        Raises:
+            sqlite3.Error: the database is not writeable
+        """
+        with self._dump_lock, self._connection:
+            for statement, parameters in statements:
+                self._connection.execute(statement, parameters)
+
+        interval = time.time() - start_time
+        self.logger.info("%s write %s rows %s",
+                         self.filename, len(statements), interval)
+        if self.audit is not None:
+            self.audit.record_dump(self.filename, interval)
+
+    def section_sizes(self):
+        """get the encoded size of the top level entrys
+
+        entrys that changed since the last write have their previous size
+
+        Returns:
+            dict, top level keys with their size in bytes
+        """
+        sizes = {}
+        for key, stored in self._rows.items():
+            if isinstance(stored, dict):
+                sizes[key] = sum(size for size, dummy in stored.values())
+            else:
+                sizes[key] = stored[0]
+        return sizes
+
+    def _dump(self, start_time, cleanup=()):
+        """write the changed rows to the database
+
+        Args:
+            start_time: float, timestamp of the save request
+            cleanup: tuple, not used
+
+        Raises:
+            sqlite3.Error: the database is not writeable
+            ValueError: the config can not be formated as json
+        """
+        statements = self._collect_changes()
+        if not statements:
+            return
+
+        if not self.threaded_save:
+            self._write_rows(statements, start_time)
+            return
+
+        self._run_in_worker(self._write_rows, statements, start_time)
+
+
+def memory_path_for_backend(memory_path, backend):
+    """get the storage path of the memory for a backend
+
+    Args:
+        memory_path: string, path of the json memory file
+        backend: string, 'json' or 'sqlite'
+
+    Returns:
+        string, the path to use for the given backend
+    """
+    if backend != 'sqlite':
+        return memory_path
+    return os.path.splitext(memory_path)[0] + '.sqlite'
@@ -1,6 +1,7 @@
 """Hangups conversationevent handler with custom pluggables for plugins"""
 # pylint:disable=wrong-import-order
 import asyncio
+import collections
 import inspect
 import logging
 import shlex
@@ -19,6 +20,195 @@ from utils.cache import Cache
 
 logger = logging.getLogger(__name__)
 
+# share of the queue size that has to be free to accept typing and watermark
+#  notifications, see EventQueue.put
+STATUS_DROP_RATIO = 0.5
+
+
+class EventQueue(object):
+    """bounded queue for event handling with one FIFO lane per conversation
+
+    the jobs of a conversation run one after another in the order they were
+    queued, jobs of different conversations run in parallel up to the number
+    of workers. A job should not wait for long, commands run as separate
+    tasks, see EventHandler._handle_chat_message
+
+    Args:
+        workers: int, number of jobs that run at the same time
+        size: int, number of waiting jobs, further events wait for free space
+    """
+    def __init__(self, workers, size):
+        self.workers = max(1, workers)
+        self.size = max(1, size)
+        self.metrics = collections.Counter()
+        self.max_depth = 0
+        self._depth = 0
+        self._running = 0
+        self._lanes = {}
+        self._coalesce = {}
+        self._ready = None
+        self._space = None
+        self._tasks = []
+
+    def start(self):
+        """start the workers"""
+        self._ready = asyncio.Queue()
+        self._space = asyncio.Event()
+        self._tasks = [asyncio.ensure_future(self._worker())
+                       for dummy in range(self.workers)]
+
+    def stop(self):
+        """cancel the workers, waiting jobs are discarded"""
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    async def put(self, conv_id, func, *args, coalesce_key=None):
+        """queue a job in the lane of a conversation
+
+        a job with a coalesce key replaces the arguments of a waiting job with
+        the same key instead, it is dropped if less than STATUS_DROP_RATIO of
+        the queue is free. Other jobs wait for free space
+
+        Args:
+            conv_id: string, conversation identifier, the lane of the job
+            func: coroutine function
+            args: tuple, positional arguments for the func
+            coalesce_key: hashable, identifier for jobs that can be merged
+        """
+        if coalesce_key is not None:
+            job = self._coalesce.get(coalesce_key)
+            if job is not None:
+                job[1] = args
+                self.metrics["coalesced"] += 1
+                return
+            if self._depth >= self.size * STATUS_DROP_RATIO:
+                self.metrics["dropped"] += 1
+                return
+        else:
+            while self._depth >= self.size:
+                self.metrics["waited"] += 1
+                self._space.clear()
+                await self._space.wait()
+
+        job = [func, args, coalesce_key]
+        if coalesce_key is not None:
+            self._coalesce[coalesce_key] = job
+
+        lane = self._lanes.get(conv_id)
+        if lane is None:
+            lane = self._lanes[conv_id] = collections.deque()
+            self._ready.put_nowait(conv_id)
+        lane.append(job)
+
+        self._depth += 1
+        self.max_depth = max(self.max_depth, self._depth)
+        self.metrics["queued"] += 1
+
+    async def _worker(self):
+        """run the next job of a ready lane"""
+        while True:
+            conv_id = await self._ready.get()
+            lane = self._lanes[conv_id]
+            func, args, coalesce_key = lane.popleft()
+            if coalesce_key is not None:
+                self._coalesce.pop(coalesce_key, None)
+            self._depth -= 1
+            self._space.set()
+
+            self._running += 1
+            try:
+                await func(*args)
+            except HangupsBotExceptions.SuppressEventHandling:
+                pass
+            except asyncio.CancelledError:
+                raise
+            except: # capture all Exceptions   # pylint: disable=bare-except
+                logger.exception("event queue: %s failed in %s",
+                                 getattr(func, "__name__", func), conv_id)
+            finally:
+                self._running -= 1
+                self.metrics["processed"] += 1
+
+            if lane:
+                # continue with other lanes first
+                self._ready.put_nowait(conv_id)
+            else:
+                del self._lanes[conv_id]
+
+    def stats(self):
+        """get the current state and counters of the queue
+
+        Returns:
+            dict, "depth", "max_depth", "lanes", "running" and the counters
+                "queued", "processed", "coalesced", "dropped" and "waited"
+        """
+        stats = {"depth": self._depth,
+                 "max_depth": self.max_depth,
+                 "lanes": len(self._lanes),
+                 "running": self._running}
+        for key in ("queued", "processed", "coalesced", "dropped", "waited"):
+            stats[key] = self.metrics[key]
+        return stats
+
+
+class HandlerAdapter(object):
+    """call a registered handler with the arguments it accepts
+
+    the signature is inspected once on registration
+
+    Args:
+        function: callable, the handling function/coro
+        priority: int, lower priorities receive the event earlier
+        meta: dict, metadata of the plugin that registered the handler
+        concurrent: boolean, True if the handler does not depend on the order
+            of handlers with the same priority
+    """
+    __slots__ = ('function', 'priority', 'meta', 'concurrent', 'label',
+                 'is_coroutine', '_size', '_names', '_optional')
+
+    def __init__(self, function, priority, meta, concurrent=False):
+        self.function = function
+        self.priority = priority
+        self.meta = meta
+        self.concurrent = concurrent
+        self.label = "%s.%s" % (meta['module.path'], function.__name__)
+        self.is_coroutine = asyncio.iscoroutinefunction(function)
+
+        # a handler may use not all args or kwargs, inspect now and filter
+        #  on call
+        expected = inspect.signature(function).parameters
+        names = tuple(expected)
+        self._size = len(names)
+        self._names = names
+        self._optional = frozenset(
+            num for num, parameter in enumerate(expected.values())
+            if parameter.default is not inspect.Parameter.empty)
+
+    def __call__(self, args, kwargs):
+        """run the handler
+
+        Args:
+            args: tuple, positional arguments of the pluggable
+            kwargs: dict, keyword arguments of the pluggable
+
+        Returns:
+            the result of the handler, a coroutine object for a coroutine
+        """
+        if not kwargs:
+            return self.function(*args[:self._size])
+
+        names = self._names
+        positional = [arg for num, arg in enumerate(args[:self._size])
+                      if num not in self._optional or names[num] not in kwargs]
+        keyword = {key: value for key, value in kwargs.items()
+                   if key in names}
+        return self.function(*positional, **keyword)
+
+    def __repr__(self):
+        return '<%s %s (%s)>' % (self.__class__.__name__, self.label,
+                                 self.priority)
+
 
 class EventHandler(object):
     """Handle Hangups conversation events
@@ -30,17 +220,21 @@ class EventHandler(object):
         self.bot = GenericEvent.bot = bot
         self.bot_command = ['/bot']
 
-        self.pluggables = {"allmessages": [],
-                           "call": [],
-                           "membership": [],
-                           "message": [],
-                           "rename": [],
-                           "history": [],
-                           "sending":[],
-                           "typing": [],
-                           "watermark": [],
+        # tuples of HandlerAdapter sorted by priority, replaced on change
+        self.pluggables = {"allmessages": (),
+                           "call": (),
+                           "membership": (),
+                           "message": (),
+                           "rename": (),
+                           "history": (),
+                           "sending": (),
+                           "typing": (),
+                           "watermark": (),
                           }
 
+        # the handlers of .pluggables grouped by priority, see ._set_handlers
+        self._bands = {pluggable: () for pluggable in self.pluggables}
+
         # timeout for messages to be received for reprocessing: 6hours
         receive_timeout = 60*60*6
 
@@ -56,6 +250,10 @@ class EventHandler(object):
         self._executables = Cache(receive_timeout,
                                   increase_on_access=False)
 
+        self.queue = EventQueue(
+            bot.config.get_option("event_queue-workers"),
+            bot.config.get_option("event_queue-size"))
+
     async def setup(self, _conv_list):
         """async init part of the handler
 
@@ -74,6 +272,7 @@ class EventHandler(object):
         self._contexts.start()
         self._image_ids.start()
         self._executables.start()
+        self.queue.start()
 
         plugins.tracking.end()
 
@@ -83,13 +282,17 @@ class EventHandler(object):
             self._handle_status_change)
 
     def register_handler(self, function, pluggable="message", priority=50,
-                         **kwargs):
+                         concurrent=False, **kwargs):
         """register an event handler
 
         Args:
             function: callable, the handling function/coro
             pluggable: string, a pluggable of .pluggables
             priority: int, lower priorities receive the event earlier
+            concurrent: boolean, toggle to run the handler in parallel to the
+                concurrent handlers with the same priority that were
+                registered right before or after it, set only if the handler
+                does not depend on changes of the event by them
             kwargs: dict, legacy to catch the positional argument 'type'
 
         Raises:
@@ -100,17 +303,55 @@ class EventHandler(object):
             logger.warning('The positional argument "type" will be removed at '
                            'any time soon.', stack_info=True)
 
-        # a handler may use not all args or kwargs, inspect now and filter later
-        expected = inspect.signature(function).parameters
-        names = list(expected)
-
         current_plugin = plugins.tracking.current
-        self.pluggables[pluggable].append(
-            (function, priority, current_plugin["metadata"], expected, names))
-        # sort by priority
-        self.pluggables[pluggable].sort(key=lambda tup: tup[1])
+        adapter = HandlerAdapter(function, priority,
+                                 current_plugin["metadata"], concurrent)
+        self._set_handlers(pluggable, self.pluggables[pluggable] + (adapter,))
         plugins.tracking.register_handler(function, pluggable, priority)
 
+    def _set_handlers(self, pluggable, adapters):
+        """replace the handlers of a pluggable
+
+        a band is a tuple of handlers that run together: a single order
+        sensitive handler or the consecutive concurrent handlers of one
+        priority, which run in parallel. The bands keep the registration
+        order of the handlers with equal priority
+
+        Args:
+            pluggable: string, a pluggable of .pluggables
+            adapters: iterable of HandlerAdapter instances
+        """
+        # sort by priority, equal priorities keep the registration order
+        adapters = tuple(sorted(adapters, key=lambda item: item.priority))
+        bands = []
+        previous = None
+        for adapter in adapters:
+            if (adapter.concurrent and previous is not None
+                    and previous.concurrent
+                    and previous.priority == adapter.priority):
+                bands[-1].append(adapter)
+            else:
+                bands.append([adapter])
+            previous = adapter
+
+        self.pluggables[pluggable] = adapters
+        self._bands[pluggable] = tuple(tuple(band) for band in bands)
+
+    def unregister_handlers(self, module_path):
+        """remove all handlers of a plugin
+
+        Args:
+            module_path: string, the module path of the plugin
+        """
+        for pluggable, adapters in list(self.pluggables.items()):
+            remaining = tuple(adapter for adapter in adapters
+                              if adapter.meta["module.path"] != module_path)
+            if len(remaining) != len(adapters):
+                logger.debug("removing %s handler of %s from %s",
+                             len(adapters) - len(remaining), module_path,
+                             pluggable)
+                self._set_handlers(pluggable, remaining)
+
     def register_context(self, context):
         """register a message context that can be later attached again
 
@@ -212,7 +453,8 @@ class EventHandler(object):
         - forward the event to handlers:
             - allmessages, all events
             - message, if user is not the bot user
-        - handle the text as command, if the user is not the bot user
+        - handle the text as command in a separate task, if the user is not
+            the bot user
 
         Args:
             event: event.ConversationEvent instance
@@ -277,7 +519,9 @@ class EventHandler(object):
         if not event.from_bot:
             await self.run_pluggable_omnibus("message", self.bot, event,
                                              command)
-            await self._handle_command(event)
+            # a command may run for a long time, keep the lane of the
+            #  conversation and the queue worker free for the next events
+            asyncio.ensure_future(self._handle_command(event))
 
     async def _handle_command(self, event):
         """Handle command messages
@@ -343,6 +587,10 @@ class EventHandler(object):
     async def run_pluggable_omnibus(self, name, *args, **kwargs):
         """forward args to a group of handler which were registered for the name
 
+        consecutive handlers with the same priority that were registered as
+        concurrent run in parallel, the next handler starts once all of them
+        finished, see ._set_handlers
+
         Args:
             name: string, a key in .pluggables
             args: tuple, positional arguments for each handler
@@ -353,14 +601,11 @@ class EventHandler(object):
             KeyError: unknown pluggable specified
             HangupsBotExceptions.SuppressEventHandling: do not handle further
         """
-        async def _run_single_handler(function, meta, expected, names):
+        async def _run_single_handler(adapter):
             """execute a single handler function
 
             Args:
-                function: callable
-                meta: dict
-                expected: ordered mapping of inspect.Parameter instances
-                names: list of strings, keys in expected
+                adapter: HandlerAdapter instance
 
             Raises:
                 HangupsBotExceptions.SuppressAllHandlers:
@@ -368,31 +613,19 @@ class EventHandler(object):
                 HangupsBotExceptions.SuppressEventHandling:
                     skip all handler and do not handle this event further
             """
-            message = ["%s: %s.%s" % (name, meta['module.path'],
-                                      function.__name__)]
             try:
-                # a function may use not all args or kwargs, filter here
-                positional = (args[num] for num in range(len(args))
-                              if (len(names) > num and (
-                                  expected[names[num]].default ==
-                                  inspect.Parameter.empty or
-                                  names[num] not in kwargs)))
-                keyword = {key: value for key, value in kwargs.items()
-                           if key in names}
-
-                logger.debug(message[0])
-                result = function(*positional, **keyword)
-                if asyncio.iscoroutinefunction(function):
+                logger.debug("%s: %s", name, adapter.label)
+                result = adapter(args, kwargs)
+                if adapter.is_coroutine:
                     await result
 
             except HangupsBotExceptions.SuppressHandler:
                 # skip this handler, continue with next
-                message.append("SuppressHandler")
-                logger.debug(" : ".join(message))
+                logger.debug("%s: %s : SuppressHandler", name, adapter.label)
             except HangupsBotExceptions.SuppressAllHandlers:
                 # skip all other pluggables, but let the event continue
-                message.append("SuppressAllHandlers")
-                logger.debug(" : ".join(message))
+                logger.debug("%s: %s : SuppressAllHandlers", name,
+                             adapter.label)
                 raise
             except HangupsBotExceptions.SuppressEventHandling:
                 # handle requested to skip all pluggables
@@ -400,21 +633,31 @@ class EventHandler(object):
             except: # capture all Exceptions   # pylint: disable=bare-except
                 # exception is not related to the handling of this
                 # pluggable, log and continue with the next handler
-                message.append("args=" + str([str(arg) for arg in args]))
-                message.append("kwargs=" + str(kwargs))
-                logger.exception(" : ".join(message))
+                logger.exception("%s: %s : args=%s : kwargs=%s", name,
+                                 adapter.label, [str(arg) for arg in args],
+                                 kwargs)
 
         try:
             if kwargs.pop('_run_concurrent_', False):
                 await asyncio.gather(
-                    *[_run_single_handler(function, meta, expected, names)
-                      for function, dummy, meta, expected, names
-                      in self.pluggables[name].copy()])
+                    *[_run_single_handler(adapter)
+                      for adapter in self.pluggables[name]])
                 return
 
-            for (function, dummy, meta, expected, names
-                ) in self.pluggables[name].copy():
-                await _run_single_handler(function, meta, expected, names)
+            for band in self._bands[name]:
+                if len(band) == 1:
+                    await _run_single_handler(band[0])
+                else:
+                    results = await asyncio.gather(
+                        *[_run_single_handler(adapter) for adapter in band],
+                        return_exceptions=True)
+                    # the band is finished, apply the strongest suppression
+                    for suppression in (
+                            HangupsBotExceptions.SuppressEventHandling,
+                            HangupsBotExceptions.SuppressAllHandlers):
+                        for result in results:
+                            if isinstance(result, suppression):
+                                raise result
 
         except HangupsBotExceptions.SuppressAllHandlers:
             pass
@@ -425,6 +668,15 @@ class EventHandler(object):
             raise
 
     async def _handle_event(self, conv_event):
+        """queue a conversation event for the handling
+
+        Args:
+            conv_event: hangups.conversation_event.ConversationEvent instance
+        """
+        await self.queue.put(conv_event.conversation_id,
+                             self._process_event, conv_event)
+
+    async def _process_event(self, conv_event):
         """Handle conversation events
 
         Args:
@@ -458,13 +710,32 @@ class EventHandler(object):
         await self.bot.conversations.update(event.conv, source="event")
 
         if pluggable is None:
-            asyncio.ensure_future(self._handle_chat_message(event))
+            await self._handle_chat_message(event)
             return
 
-        asyncio.ensure_future(self.run_pluggable_omnibus(
-            pluggable, self.bot, event, command))
+        await self.run_pluggable_omnibus(pluggable, self.bot, event, command)
 
     async def _handle_status_change(self, state_update):
+        """queue a typing or watermark notification for the handling
+
+        a waiting notification of the same kind from the same user in the
+        conversation is replaced by the new one
+
+        Args:
+            state_update: hangups.parsers.TypingStatusMessage or
+             hangups.parsers.WatermarkNotification instance
+        """
+        if isinstance(state_update, hangups.parsers.TypingStatusMessage):
+            pluggable = "typing"
+        else:
+            pluggable = "watermark"
+
+        await self.queue.put(
+            state_update.conv_id, self._process_status_change, state_update,
+            coalesce_key=(pluggable, state_update.conv_id,
+                          state_update.user_id.chat_id))
+
+    async def _process_status_change(self, state_update):
         """run notification handler for a given state_update
 
         Args:
@@ -479,8 +750,7 @@ class EventHandler(object):
             pluggable = "watermark"
             event = WatermarkEvent(state_update)
 
-        asyncio.ensure_future(self.run_pluggable_omnibus(
-            pluggable, self.bot, event, command))
+        await self.run_pluggable_omnibus(pluggable, self.bot, event, command)
 
 
 class HandlerBridge:
@@ -26,11 +26,18 @@ class HangupsConversation(hangups.conversation.Conversation):
         self._conv_list = bot._conv_list
         # retrieve the conversation record from hangups, if available
         try:
-            conversation = self._conv_list.get(conv_id)._conversation
-            super().__init__(self._client, self._user_list, conversation, [])
-            return
+            conversation = self._conv_list.get(conv_id)
         except KeyError:
             logger.debug("%s not found in conv list", conv_id)
+        else:
+            if (not isinstance(conversation, LazyConversation)
+                    or conversation._conv is not None):
+                super().__init__(self._client, self._user_list,
+                                 conversation._conversation, [])
+                return
+            # an unloaded placeholder is built from permamem, accessing it
+            #  here would materialize it again
+            logger.debug("%s is a placeholder", conv_id)
 
         # retrieve the conversation record from permamem
         try:
@@ -208,3 +215,78 @@ class HangupsConversation(hangups.conversation.Conversation):
         except hangups.NetworkError as err:
             logger.error('%s on sending to %s:\n%s\nimage=%s\n',
                          repr(err), self.id_, serialised_segments, image_id)
+
+
+class LazyConversation(object):
+    """placeholder for a HangupsConversation that is built on first access
+
+    the id, name and archive state are answered without building the
+    conversation, any other attribute access creates the HangupsConversation,
+    replaces the placeholder in the conv list and is forwarded to it
+
+    Args:
+        bot: HangupsBot instance
+        conv_id: string, Hangouts conversation identifier
+    """
+    __slots__ = ('_bot', '_conv_id', '_conv')
+
+    def __init__(self, bot, conv_id):
+        object.__setattr__(self, '_bot', bot)
+        object.__setattr__(self, '_conv_id', conv_id)
+        object.__setattr__(self, '_conv', None)
+
+    @property
+    def id_(self):
+        """get the conversation identifier
+
+        Returns:
+            string
+        """
+        return self._conv_id
+
+    @property
+    def name(self):
+        """get the custom title or gernerate one from participant names
+
+        Returns:
+            string
+        """
+        return self._bot.conversations.get_name(self)
+
+    @property
+    def is_archived(self):
+        """check weather the conversation is archived
+
+        Returns:
+            boolean, False for a placeholder as cached conversations are
+                created in the inbox view
+        """
+        if self._conv is None:
+            return False
+        return self._conv.is_archived
+
+    def materialize(self):
+        """build the HangupsConversation
+
+        Returns:
+            HangupsConversation instance
+        """
+        if self._conv is None:
+            conv = HangupsConversation(self._bot, self._conv_id)
+            object.__setattr__(self, '_conv', conv)
+
+            # pylint:disable=protected-access
+            conv_dict = self._bot._conv_list._conv_dict
+            if conv_dict.get(self._conv_id) is self:
+                conv_dict[self._conv_id] = conv
+        return self._conv
+
+    def __getattr__(self, name):
+        return getattr(self.materialize(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.materialize(), name, value)
+
+    def __repr__(self):
+        return '<%s %s%s>' % (self.__class__.__name__, self._conv_id,
+                              '' if self._conv is None else ' (loaded)')
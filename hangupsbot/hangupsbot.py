@@ -23,6 +23,9 @@ from exceptions import HangupsBotExceptions
 from hangups_conversation import HangupsConversation
 
 import config
+import config_audit
+import config_sharded
+import config_sqlite
 import handlers
 import permamem
 import plugins
@@ -41,8 +44,31 @@ DEFAULT_CONFIG = {
                           " <b>{bot_cmd} optout</b>.</i>"),
     # count
     "memory-failsafe_backups": 3,
+    # in seconds, minimum age of the last backup to create a new one
+    "memory-failsafe_interval": 300,
     # in seconds
     "memory-save_delay": 1,
+    # write memory.json in a worker thread
+    "memory-threaded_save": False,
+    # in bytes, rewrite memory.json once its journal passed the size, 0=off
+    "memory-journal_size": 0,
+    # file format of memory.json: "pretty", "compact" or "gzip"
+    "memory-format": "pretty",
+    # top level entrys of the memory to load on start, other entrys are
+    #  loaded on first access, null=load all on start
+    "memory-eager_sections": ["user_data", "conv_data", "convmem"],
+    # record memory access and saves per plugin, see /bot memoryaudit
+    "memory-audit": False,
+    # days without activity to move a conversation or user from the memory to
+    #  the archive file, 0=off
+    "memory-archive_days": 0,
+    # number of events that are handled at the same time
+    "event_queue-workers": 10,
+    # number of events waiting for the handling, further events wait for free
+    #  space, typing and watermark notifications are dropped at half the size
+    "event_queue-size": 1000,
+    # in seconds, interval to check config.json for external changes, 0=off
+    "config-watch_interval": 5,
 }
 
 class HangupsBot(object):
@@ -53,13 +79,17 @@ class HangupsBot(object):
         config_path: string, path on disk to the bot configuration json
         memory_path: string, path on disk to the bot memory json
         max_retries: integer, retry count for lowlevel errors
+        memory_backend: string, 'json', 'sharded' or 'sqlite' as storage of
+            the memory
     """
-    def __init__(self, cookies_path, config_path, memory_path, max_retries):
+    def __init__(self, cookies_path, config_path, memory_path, max_retries,
+                 memory_backend="json"):
         self._client = None
         self._cookies_path = cookies_path
         self._max_retries = max_retries
         self.__retry = 0
         self.__retry_reset = None
+        self.__config_watcher = None
 
         # These are populated by ._on_connect when it's called.
         self.shared = None # safe place to store references to objects
@@ -90,17 +120,52 @@ class HangupsBot(object):
 
         # load memory file
         _failsafe_backups = self.config.get_option("memory-failsafe_backups")
+        _failsafe_interval = self.config.get_option("memory-failsafe_interval")
         _save_delay = self.config.get_option("memory-save_delay")
-
-        logger.info("memory = %s, failsafe = %s, delay = %s",
-                    memory_path, _failsafe_backups, _save_delay)
-        self.memory = config.Config(memory_path,
-                                    failsafe_backups=_failsafe_backups,
-                                    save_delay=_save_delay)
+        _threaded_save = self.config.get_option("memory-threaded_save")
+        _journal_size = self.config.get_option("memory-journal_size")
+        _format = self.config.get_option("memory-format")
+        _eager_sections = self.config.get_option("memory-eager_sections")
+        if _eager_sections is not None:
+            _eager_sections = tuple(_eager_sections)
+
+        logger.info("memory = %s, backend = %s, failsafe = %s, delay = %s, "
+                    "threaded = %s, journal = %s, format = %s", memory_path,
+                    memory_backend, _failsafe_backups, _save_delay,
+                    _threaded_save, _journal_size, _format)
+        if memory_backend == "sqlite":
+            self.memory = config_sqlite.SQLiteConfig(
+                config_sqlite.memory_path_for_backend(memory_path,
+                                                      memory_backend),
+                migrate_from=memory_path,
+                save_delay=_save_delay,
+                threaded_save=_threaded_save,
+                eager_sections=_eager_sections)
+        elif memory_backend == "sharded":
+            self.memory = config_sharded.ShardedConfig(
+                memory_path,
+                failsafe_backups=_failsafe_backups,
+                failsafe_interval=_failsafe_interval,
+                save_delay=_save_delay,
+                threaded_save=_threaded_save,
+                journal_size=_journal_size,
+                serializer=_format,
+                eager_sections=_eager_sections)
+        else:
+            self.memory = config.Config(memory_path,
+                                        failsafe_backups=_failsafe_backups,
+                                        failsafe_interval=_failsafe_interval,
+                                        save_delay=_save_delay,
+                                        threaded_save=_threaded_save,
+                                        journal_size=_journal_size,
+                                        serializer=_format,
+                                        eager_sections=_eager_sections)
         self.memory.logger = logging.getLogger("memory")
+        if self.config.get_option("memory-audit"):
+            self.memory.audit = config_audit.AccessAudit()
         try:
             self.memory.load()
-        except (OSError, IOError, ValueError):
+        except (OSError, IOError, ValueError, config_sqlite.sqlite3.Error):
             logger.exception("FAILED TO LOAD/RECOVER A MEMORY FILE")
             sys.exit(1)
         self.get_memory_option = self.memory.get_option
@@ -285,6 +350,16 @@ class HangupsBot(object):
         if self.__retry_reset is not None:
             self.__retry_reset.cancel()
 
+        if self.__config_watcher is not None:
+            self.__config_watcher.cancel()
+            self.__config_watcher = None
+
+        if self.conversations is not None:
+            self.conversations.stop()
+
+        if self._handlers is not None:
+            self._handlers.queue.stop()
+
         #pylint:disable=protected-access,bare-except
         try:
             # ignore a previous Exception
@@ -366,17 +441,8 @@ class HangupsBot(object):
         Returns:
             list, a list of unique hangups.User instances
         """
-        if isinstance(conv_ids, str):
-            conv_ids = [conv_ids]
-        conv_ids = list(set(conv_ids))
-
-        all_users = {}
-        for convid in conv_ids:
-            conv_data = self.conversations[convid]
-            for chat_id in conv_data["participants"]:
-                all_users[chat_id] = self.get_hangups_user(chat_id)
-
-        return list(all_users.values())
+        return [self.get_hangups_user(chat_id)
+                for chat_id in self.conversations.get_participants(conv_ids)]
 
     def get_config_suboption(self, conv_id, option):
         """get an entry in the conv config with a fallback to top level
@@ -400,6 +466,7 @@ class HangupsBot(object):
             keyname: string, new or existing entry in the users memory
             keyvalue: any type, the new value to be set
         """
+        self._restore_user(chat_id)
         self.memory.set_by_path(["user_data", chat_id, keyname], keyvalue)
         self.memory.save()
 
@@ -413,12 +480,30 @@ class HangupsBot(object):
         Returns:
             any type, the requested value or None if the entry does not exist
         """
+        self._restore_user(chat_id)
         try:
             return self.memory.get_by_path(["user_data", chat_id, keyname],
                                            fallback=False)
         except KeyError:
             return None
 
+    def _restore_user(self, chat_id):
+        """move an archived user back into the memory
+
+        call this before any access on the users memory entry, a new entry
+        would hide the archived one
+
+        Args:
+            chat_id: string, G+ id of the user
+
+        Returns:
+            boolean, True if the user has an entry in the memory
+        """
+        if self.memory.exists(["user_data", chat_id]):
+            return True
+        return (self.conversations is not None
+                and self.conversations.restore_user(chat_id))
+
     def conversation_memory_set(self, conv_id, keyname, keyvalue):
         """set a value in the conversations memory entry and dump the memory
 
@@ -476,7 +561,7 @@ class HangupsBot(object):
         if memory_1on1 is not None:
             logger.debug("get_1on1: remembered %s for %s",
                          memory_1on1, chat_id)
-            return HangupsConversation(self, memory_1on1)
+            return self.conversations.get_hangups_conversation(memory_1on1)
 
         # create a new 1-to-1 conversation with the designated chat id and send
         # an introduction message as the invitation text
@@ -518,7 +603,7 @@ class HangupsBot(object):
                 bot_cmd=self.command_prefix)
             await self.coro_send_message(new_conv_id, introduction)
 
-        return HangupsConversation(self, new_conv_id)
+        return self.conversations.get_hangups_conversation(new_conv_id)
 
     def initialise_memory(self, key, datatype):
         """initialise the dict for a given key in the datatype in .memory
@@ -531,6 +616,8 @@ class HangupsBot(object):
             boolean, True if an new entry for the key was created in the
                 datatype, otherwise False
         """
+        if datatype == "user_data":
+            self._restore_user(key)
         return self.memory.ensure_path([datatype, key])
 
     async def _on_connect(self):
@@ -556,6 +643,11 @@ class HangupsBot(object):
 
         logger.debug("connected")
 
+        watch_interval = self.config.get_option("config-watch_interval")
+        if watch_interval and self.__config_watcher is None:
+            self.__config_watcher = asyncio.ensure_future(
+                self.config.watch(watch_interval))
+
         self.shared = {}
         self.tags = tagging.tags(self)
         self._handlers = handlers.EventHandler(self)
@@ -635,7 +727,7 @@ class HangupsBot(object):
             logger.debug("message sending: %s", response[0])
 
             # use a fake Hangups Conversation having a fallback to permamem
-            conv = HangupsConversation(self, response[0])
+            conv = self.conversations.get_hangups_conversation(response[0])
 
             await conv.send_message(response[1],
                                     image_id=response[2],
@@ -655,7 +747,8 @@ class HangupsBot(object):
             boolean, True if the message was sent,
                 otherwise False - unknown user, optouted or error on .get_1to1()
         """
-        if not self.memory.exists(["user_data", chat_id, "_hangups"]):
+        if (not self._restore_user(chat_id)
+                or not self.memory.exists(["user_data", chat_id, "_hangups"])):
             logger.info("%s is not a valid user", chat_id)
             return False
 
@@ -892,6 +985,12 @@ def main():
                         help=_("memory storage path"))
     parser.add_argument("--config", default=default_config_path,
                         help=_("config storage path"))
+    parser.add_argument("--memory-backend", default="json",
+                        choices=("json", "sharded", "sqlite"),
+                        help=_("memory storage format, a sqlite database or "
+                               "a directory of sharded files is created next "
+                               "to the memory path and imports an existing "
+                               "memory file"))
     parser.add_argument("--retries", default=5, type=int,
                         help=_("Maximum disconnect / reconnect retries before "
                                "quitting"))
@@ -923,7 +1022,8 @@ def main():
     configure_logging(args)
 
     # initialise the bot
-    bot = HangupsBot(args.cookies, args.config, args.memory, args.retries)
+    bot = HangupsBot(args.cookies, args.config, args.memory, args.retries,
+                     memory_backend=args.memory_backend)
 
     # start the bot
     bot.run()
@@ -1,18 +1,485 @@
 """hangups conversation data cache"""
 # pylint: disable=W0212
-from datetime import datetime
+import asyncio
+import collections
+from datetime import datetime, timedelta
+import functools
 import logging
+import os
 import random
 import re
+import time
 
 import hangups
 
-from hangups_conversation import HangupsConversation
+import config
+from hangups_conversation import HangupsConversation, LazyConversation
 
 logger = logging.getLogger(__name__)
 
 SENTINEL = object()
 
+# filter types of ConversationMemory.get, "<type>:<query>"
+FILTER_TYPES = ('text', 'id', 'chat_id', 'type', 'minusers', 'maxusers',
+                'random', 'tag')
+
+# length of the title substrings in the text index
+NGRAM_SIZE = 3
+
+# in seconds, minimum age of the last full update of a conversation with an
+#  unchanged fingerprint to schedule a new one
+RECONCILE_INTERVAL = 300
+
+# in seconds, delay of a scheduled full update
+RECONCILE_DELAY = 5
+
+# in seconds, time to collect user ids for a combined lookup
+LOOKUP_WINDOW = 0.2
+
+# maximum number of users per lookup request
+LOOKUP_CHUNK_SIZE = 100
+
+# number of lookup requests running in parallel
+LOOKUP_CONCURRENCY = 2
+
+# in seconds, time to skip the lookup of a user the server did not resolve
+LOOKUP_NEGATIVE_TTL = 3600
+
+# number of entrys processed between yields to the event loop on start
+INIT_CHUNK_SIZE = 100
+
+# maximum number of cached HangupsConversation instances
+CONV_CACHE_SIZE = 256
+
+# string values of the conversation entrys that repeat across entrys
+SHARED_CONV_VALUES = ("type", "status", "source")
+
+# in seconds, interval of the sweeps that move inactive entrys to the archive
+ARCHIVE_INTERVAL = 86400
+
+
+def _share_string(pool, value):
+    """get the shared instance of a string
+
+    Args:
+        pool: dict, strings as keys and their shared instance as value
+        value: string
+
+    Returns:
+        string, the first seen instance of an equal string
+    """
+    return pool.setdefault(value, value)
+
+
+def _share_keys(data, share):
+    """replace the string keys of a dict with shared strings in place
+
+    Args:
+        data: dict
+        share: callable, returns the shared instance of a string
+    """
+    items = [(share(key) if isinstance(key, str) else key, value)
+             for key, value in data.items()]
+    data.clear()
+    data.update(items)
+
+
+def compact_memory(user_data, convmem, pool=None):
+    """share equal strings between the user and conversation entrys
+
+    the entrys keep their json types, ids and repeating values are replaced
+    with a shared instance so that each of them is held only once. This saves
+    the duplicate strings only, the dicts and lists of the entrys remain,
+    see tests/memory-benchmark.py for the effect on a synthetic memory.
+
+    Args:
+        user_data: dict, the "user_data" entry of the bot memory
+        convmem: dict, the "convmem" entry of the bot memory
+        pool: dict, strings as keys and their shared instance as value, pass
+            the pool that is used for new entrys, None for a temporary pool
+    """
+    pool = {} if pool is None else pool
+    share = functools.partial(_share_string, pool)
+
+    _share_keys(user_data, share)
+    for chat_id, user in user_data.items():
+        if not isinstance(user, dict):
+            continue
+        cached = user.get("_hangups")
+        if isinstance(cached, dict) and cached.get("chat_id") == chat_id:
+            cached["chat_id"] = chat_id
+        if isinstance(user.get("1on1"), str):
+            user["1on1"] = share(user["1on1"])
+
+    _share_keys(convmem, share)
+    for conv in convmem.values():
+        if not isinstance(conv, dict):
+            continue
+        participants = conv.get("participants")
+        if isinstance(participants, list):
+            participants[:] = [share(chat_id)
+                               if isinstance(chat_id, str) else chat_id
+                               for chat_id in participants]
+        for key in SHARED_CONV_VALUES:
+            if isinstance(conv.get(key), str):
+                conv[key] = share(conv[key])
+
+
+def _ngrams(text, share=None):
+    """split a text into overlapping substrings
+
+    Args:
+        text: string
+        share: callable, returns the shared instance of a substring, None to
+            keep the new strings
+
+    Returns:
+        set of strings with a length of NGRAM_SIZE
+    """
+    grams = set(text[index:index + NGRAM_SIZE]
+                for index in range(len(text) - NGRAM_SIZE + 1))
+    if share is None:
+        return grams
+    return set(share(gram) for gram in grams)
+
+
+@functools.lru_cache(maxsize=256)
+def compile_filter(raw_filter):
+    """split a filter into its terms
+
+    supports sequential boolean operations,
+    each term must be enclosed with brackets "( ... )"
+
+    Args:
+        raw_filter: string, filter for conv title, id, tags, type, user count
+
+    Returns:
+        tuple, a tuple of tuple, (operator: string, type: string, query: any)
+            an unknown filter type is returned as 'invalid:<type>'
+
+    Raises:
+        ValueError: invalid boolean operator or invalid user count
+    """
+    raw_filter = raw_filter.strip()
+    terms = []
+    operator = "start"
+    while raw_filter.startswith("("):
+        tokens = re.split(r"(?<!\\)(?:\\\\)*\)", raw_filter, maxsplit=1)
+        terms.append((operator, tokens[0][1:]))
+        if len(tokens) != 2:
+            break
+        raw_filter = tokens[1]
+        if not raw_filter:
+            # finished consuming entire string
+            pass
+        elif re.match(r"^\s*and\s*\(", raw_filter, re.IGNORECASE):
+            operator = "and"
+            raw_filter = tokens[1][raw_filter.index('('):].strip()
+        elif re.match(r"^\s*or\s*\(", raw_filter, re.IGNORECASE):
+            operator = "or"
+            raw_filter = tokens[1][raw_filter.index('('):].strip()
+        else:
+            raise ValueError('invalid boolean operator near "%s"' %
+                             raw_filter.strip())
+
+    if raw_filter or not terms:
+        # second condition is to ensure at least one term, even if blank
+        terms.append((operator, raw_filter))
+
+    logger.debug("compile_filter() with terms: %s", terms)
+
+    plan = []
+    for operator, term in terms:
+        type_, query = term.split(":", 1) if ":" in term else ("id", term)
+        if type_ not in FILTER_TYPES:
+            plan.append((operator, "invalid:" + type_, query))
+        elif not query:
+            plan.append((operator, "all", query))
+        elif type_ in ("minusers", "maxusers"):
+            plan.append((operator, type_, int(query)))
+        elif type_ == "random":
+            plan.append((operator, type_, float(query)))
+        elif type_ == "type":
+            plan.append((operator, type_, query.upper()))
+        else:
+            plan.append((operator, type_, query))
+    return tuple(plan)
+
+
+class ConversationCatalog(dict):
+    """conversation cache with secondary indexes for ConversationMemory.get
+
+    the indexes are updated on item assignment, call .reindex after changing
+    an entry in place
+
+    Args:
+        share: callable, returns the shared instance of a title substring,
+            None to keep the new strings
+    """
+    def __init__(self, share=None):
+        super().__init__()
+        self._share = share
+        self.types = {}
+        self.participants = {}
+        self.counts = {}
+        self.ngrams = {}
+        self.titles = {}
+        self._indexed = {}
+
+    @staticmethod
+    def _add(index, key, conv_id):
+        index.setdefault(key, set()).add(conv_id)
+
+    @staticmethod
+    def _discard(index, key, conv_id):
+        ids = index.get(key)
+        if ids is None:
+            return
+        ids.discard(conv_id)
+        if not ids:
+            del index[key]
+
+    def _index(self, conv_id, convdata):
+        """add a conversation to the indexes
+
+        Args:
+            conv_id: string, conversation identifier
+            convdata: dict, permamem entry of the conversation
+        """
+        title = str(convdata.get("title", "")).lower()
+        title_compact = title.replace(" ", "")
+        participants = frozenset(convdata.get("participants", ()))
+        # the substrings are kept as tuple as it is smaller than a set
+        entry = (convdata.get("type"), participants, len(participants),
+                 tuple(_ngrams(title_compact, self._share)))
+        self._indexed[conv_id] = entry
+        self.titles[conv_id] = (title, title_compact)
+
+        self._add(self.types, entry[0], conv_id)
+        for chat_id in participants:
+            self._add(self.participants, chat_id, conv_id)
+        self._add(self.counts, entry[2], conv_id)
+        for gram in entry[3]:
+            self._add(self.ngrams, gram, conv_id)
+
+    def _unindex(self, conv_id):
+        """remove a conversation from the indexes
+
+        Args:
+            conv_id: string, conversation identifier
+        """
+        entry = self._indexed.pop(conv_id, None)
+        if entry is None:
+            return
+        self.titles.pop(conv_id, None)
+
+        self._discard(self.types, entry[0], conv_id)
+        for chat_id in entry[1]:
+            self._discard(self.participants, chat_id, conv_id)
+        self._discard(self.counts, entry[2], conv_id)
+        for gram in entry[3]:
+            self._discard(self.ngrams, gram, conv_id)
+
+    def reindex(self, conv_id):
+        """update the indexes for an entry that was changed in place
+
+        Args:
+            conv_id: string, conversation identifier
+        """
+        self._unindex(conv_id)
+        if conv_id in self:
+            self._index(conv_id, dict.__getitem__(self, conv_id))
+
+    def match_text(self, query, source):
+        """find conversations with the query in their title
+
+        Args:
+            query: string, part of the title, spaces are optional
+            source: set of conv ids to search in or None for all
+
+        Returns:
+            set of conv ids
+        """
+        query = query.lower()
+        query_compact = query.replace(" ", "")
+        if len(query_compact) >= NGRAM_SIZE:
+            candidates = None
+            # start with the rarest substring
+            for ids in sorted((self.ngrams.get(gram, set())
+                               for gram in _ngrams(query_compact)), key=len):
+                candidates = (ids.copy() if candidates is None
+                              else candidates.intersection(ids))
+                if not candidates:
+                    return set()
+        else:
+            candidates = self.titles.keys()
+        if source is not None:
+            candidates = source.intersection(candidates)
+
+        titles = self.titles
+        return set(conv_id for conv_id in candidates
+                   if query in titles[conv_id][0]
+                   or query in titles[conv_id][1])
+
+    def members(self, conv_id):
+        """get the participants of a conversation
+
+        Args:
+            conv_id: string, conversation identifier
+
+        Returns:
+            frozenset of chat ids
+
+        Raises:
+            KeyError: the conversation is unknown
+        """
+        return self._indexed[conv_id][1]
+
+    def memberships(self, chat_id):
+        """get the conversations a user participates in
+
+        Args:
+            chat_id: string, G+ id of the user
+
+        Returns:
+            frozenset of conv ids
+        """
+        return frozenset(self.participants.get(chat_id, ()))
+
+    def match_users(self, minimum=None, maximum=None):
+        """find conversations by their participant count
+
+        Args:
+            minimum: int, lower limit
+            maximum: int, upper limit
+
+        Returns:
+            set of conv ids
+        """
+        matched = set()
+        for count, ids in self.counts.items():
+            if ((minimum is None or count >= minimum)
+                    and (maximum is None or count <= maximum)):
+                matched.update(ids)
+        return matched
+
+    def __setitem__(self, conv_id, convdata):
+        self._unindex(conv_id)
+        dict.__setitem__(self, conv_id, convdata)
+        self._index(conv_id, convdata)
+
+    def __delitem__(self, conv_id):
+        dict.__delitem__(self, conv_id)
+        self._unindex(conv_id)
+
+    def pop(self, conv_id, *args):
+        self._unindex(conv_id)
+        return dict.pop(self, conv_id, *args)
+
+    def popitem(self):
+        conv_id, convdata = dict.popitem(self)
+        self._unindex(conv_id)
+        return conv_id, convdata
+
+    def setdefault(self, conv_id, default=None):
+        if conv_id not in self:
+            self[conv_id] = default
+        return dict.__getitem__(self, conv_id)
+
+    def update(self, *args, **kwargs):
+        for conv_id, convdata in dict(*args, **kwargs).items():
+            self[conv_id] = convdata
+
+    def clear(self):
+        dict.clear(self)
+        for index in (self.types, self.participants, self.counts, self.ngrams,
+                      self.titles, self._indexed):
+            index.clear()
+
+class UserNameIndex(object):
+    """search index for user names and nicknames
+
+    the entrys are updated by ConversationMemory.reindex_user
+    """
+    def __init__(self):
+        self.names = {}
+        self.nicknames = {}
+        self.ngrams = {}
+
+    def set_user(self, chat_id, full_name, nickname=None):
+        """add or update the names of a user
+
+        Args:
+            chat_id: string, G+ id of the user
+            full_name: string, the users name
+            nickname: string, the custom name of the user or None
+        """
+        self.remove_user(chat_id)
+        full_name = str(full_name).lower()
+        full_name_compact = full_name.replace(" ", "")
+        nickname = nickname.lower() if nickname else ""
+        self.names[chat_id] = (full_name, full_name_compact, nickname)
+
+        if nickname:
+            ConversationCatalog._add(self.nicknames, nickname, chat_id)
+        for gram in _ngrams(full_name_compact):
+            ConversationCatalog._add(self.ngrams, gram, chat_id)
+
+    def remove_user(self, chat_id):
+        """remove a user from the index
+
+        Args:
+            chat_id: string, G+ id of the user
+        """
+        entry = self.names.pop(chat_id, None)
+        if entry is None:
+            return
+        if entry[2]:
+            ConversationCatalog._discard(self.nicknames, entry[2], chat_id)
+        for gram in _ngrams(entry[1]):
+            ConversationCatalog._discard(self.ngrams, gram, chat_id)
+
+    def match(self, text, source=None):
+        """find users by their nickname or a part of their name
+
+        an exact nickname match takes precedence over name matches
+
+        Args:
+            text: string, the nickname or a part of the name, spaces are
+                optional
+            source: iterable of chat ids to search in, None to search all
+
+        Returns:
+            set of chat ids
+        """
+        text = text.lower()
+        nicknamed = self.nicknames.get(text, set())
+        if source is not None:
+            nicknamed = nicknamed.intersection(source)
+        if nicknamed:
+            return set(nicknamed)
+
+        text_compact = text.replace(" ", "")
+        if len(text_compact) >= NGRAM_SIZE:
+            candidates = None
+            # start with the rarest substring
+            for ids in sorted((self.ngrams.get(gram, set())
+                               for gram in _ngrams(text_compact)), key=len):
+                candidates = (ids.copy() if candidates is None
+                              else candidates.intersection(ids))
+                if not candidates:
+                    return set()
+        else:
+            candidates = self.names.keys()
+        if source is not None:
+            candidates = set(source).intersection(candidates)
+
+        names = self.names
+        return set(chat_id for chat_id in candidates
+                   if text in names[chat_id][0]
+                   or text in names[chat_id][1])
+
+
 def name_from_hangups_conversation(conv):
     """get the name for supplied hangups conversation
     based on hangups.ui.utils.get_conv_name, except without the warnings
@@ -31,14 +498,154 @@ def name_from_hangups_conversation(conv):
              if not user.is_self]
     return ', '.join(names)
 
-def load_missing_entrys(bot):
+def conversation_fingerprint(conv):
+    """get the attributes of a conversation that are stored in the permamem
+
+    the names of the participants are not included, they are checked during
+    the periodic full updates
+
+    Args:
+        conv: hangups.conversation.Conversation instance
+
+    Returns:
+        tuple, the raw values of name, type, otr, status, link sharing and the
+            participant chat ids
+    """
+    _conversation = conv._conversation
+    return (_conversation.name,
+            _conversation.type,
+            _conversation.otr_status,
+            _conversation.self_conversation_state.status,
+            _conversation.group_link_sharing_status,
+            tuple(part.id.chat_id for part in _conversation.participant_data))
+
+class UserLookup(object):
+    """combine user lookups of concurrent callers into chunked requests
+
+    requested ids are collected for LOOKUP_WINDOW seconds, ids that are
+    already queued or in a running request are not requested again
+
+    Args:
+        memory: ConversationMemory instance
+    """
+    def __init__(self, memory):
+        self.memory = memory
+        self._queued = {}
+        self._running = {}
+        self._unresolved = {}
+        self._timer = None
+        self._semaphore = None
+
+    async def request(self, chat_ids, force=False):
+        """lookup users and store the results in the user memory
+
+        Args:
+            chat_ids: iterable of strings, G+ ids
+            force: boolean, toggle to include ids the server did not resolve
+                recently
+
+        Returns:
+            integer, number of updated users
+        """
+        loop = asyncio.get_event_loop()
+        now = time.time()
+        futures = []
+        for chat_id in set(chat_ids):
+            if not force and self._unresolved.get(chat_id, 0) > now:
+                continue
+            future = self._running.get(chat_id) or self._queued.get(chat_id)
+            if future is None:
+                future = self._queued[chat_id] = loop.create_future()
+            futures.append(future)
+
+        if self._queued and self._timer is None:
+            self._timer = loop.call_later(LOOKUP_WINDOW, self._flush)
+
+        if not futures:
+            return 0
+        # the futures are shared with other callers, a cancelled caller must
+        #  not cancel them
+        results = await asyncio.gather(
+            *[asyncio.shield(future) for future in futures])
+        return sum(results)
+
+    def _flush(self):
+        """start the requests for the queued ids"""
+        self._timer = None
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(LOOKUP_CONCURRENCY)
+
+        queued, self._queued = self._queued, {}
+        self._running.update(queued)
+        chat_ids = list(queued)
+        for index in range(0, len(chat_ids), LOOKUP_CHUNK_SIZE):
+            chunk = {chat_id: queued[chat_id] for chat_id in
+                     chat_ids[index:index + LOOKUP_CHUNK_SIZE]}
+            asyncio.ensure_future(self._lookup(chunk))
+
+    async def _lookup(self, chunk):
+        """request a chunk of users and resolve the futures of the callers
+
+        Args:
+            chunk: dict, chat ids as keys and futures as values
+        """
+        bot = self.memory.bot
+        results = dict.fromkeys(chunk, False)
+        try:
+            async with self._semaphore:
+                logger.debug("getentitybyid(): %s", list(chunk))
+                request = hangups.hangouts_pb2.GetEntityByIdRequest(
+                    request_header=bot.get_request_header(),
+                    batch_lookup_spec=[
+                        hangups.hangouts_pb2.EntityLookupSpec(gaia_id=chat_id)
+                        for chat_id in chunk])
+                response = await bot.get_entity_by_id(request)
+
+        except hangups.exceptions.NetworkError:
+            logger.exception("getentitybyid(): FAILED for %s", list(chunk))
+
+        else:
+            with bot.memory.transaction():
+                for entity in response.entity:
+                    user = hangups.user.User.from_entity(entity, False)
+                    bot._user_list._user_dict[user.id_] = user
+                    results[user.id_.chat_id] = bool(
+                        self.memory.store_user_memory(user))
+                    self._unresolved.pop(user.id_.chat_id, None)
+                bot.memory.save()
+
+            resolved = set(entity.id.chat_id for entity in response.entity)
+            expiry = time.time() + LOOKUP_NEGATIVE_TTL
+            for chat_id in chunk:
+                if chat_id not in resolved:
+                    self._unresolved[chat_id] = expiry
+            if len(resolved) < len(chunk):
+                logger.info("getentitybyid(): %s users not resolved",
+                            len(chunk) - len(resolved))
+
+        finally:
+            for chat_id, future in chunk.items():
+                if self._running.get(chat_id) is future:
+                    del self._running[chat_id]
+                if not future.done():
+                    future.set_result(results.get(chat_id, False))
+
+
+async def load_missing_entrys(bot):
     """load users and conversations that are missing on bot start into hangups
 
+    conversations that are only known from memory are added as placeholders,
+    see hangups_conversation.LazyConversation. Yields to the event loop every
+    INIT_CHUNK_SIZE entrys
+
     Args:
         bot: HangupsBot instance
     """
     loaded_users = bot._user_list._user_dict
-    for chat_id, user_data in bot.memory["user_data"].items():
+    for index, (chat_id, user_data) in enumerate(
+            list(bot.memory["user_data"].items())):
+        if index % INIT_CHUNK_SIZE == 0:
+            await asyncio.sleep(0)
         if any((len(chat_id) != 21,
                 not chat_id.isdigit(),
                 not isinstance(user_data, dict),
@@ -53,12 +660,20 @@ def load_missing_entrys(bot):
                                  user_data["_hangups"]["emails"], False)
         loaded_users[user_id] = user
 
-    for conv_id in bot.conversations:
-        conv = HangupsConversation(bot, conv_id)
-        bot._conv_list._conv_dict[conv_id] = conv
+    conv_dict = bot._conv_list._conv_dict
+    for index, conv_id in enumerate(list(bot.conversations)):
+        if index % INIT_CHUNK_SIZE == 0:
+            await asyncio.sleep(0)
+        if conv_id in conv_dict:
+            conv_dict[conv_id] = HangupsConversation(bot, conv_id)
+        else:
+            conv_dict[conv_id] = LazyConversation(bot, conv_id)
 
 async def initialise(bot):
-    """load cache from memory and update it with new data from hangups
+    """load cache from memory and schedule the update with data from hangups
+
+    the catalog is available once this returns, the reconciliation with
+    hangups runs in the background, see ConversationMemory.startup
 
     Args:
         bot: HangupsBot instance
@@ -69,16 +684,13 @@ async def initialise(bot):
     permamem = ConversationMemory(bot)
 
     permamem.standardise_memory()
-    await permamem.load_from_hangups()
-    await permamem.load_from_memory()
+    users_to_fetch = set()
+    await permamem.load_catalog(users_to_fetch)
 
     # set the attribute here as a HangupsConversation might needs to access it
     bot.conversations = permamem
-    load_missing_entrys(bot)
-
-    permamem.stats()
-
-    bot.memory.save()
+    permamem.startup = asyncio.ensure_future(
+        permamem.reconcile_startup(users_to_fetch))
     return permamem
 
 
@@ -90,15 +702,30 @@ class ConversationMemory(object):
     """
     def __init__(self, bot):
         self.bot = bot
-        self.catalog = {}
+        # shared instances of ids and repeating values, see compact_memory
+        self._strings = {}
+        self._share = functools.partial(_share_string, self._strings)
+        self.catalog = ConversationCatalog(self._share)
+        self._fingerprints = {}
+        self._reconciled = {}
+        self._reconcile_handles = {}
+        self._user_lookup = UserLookup(self)
+        self.startup = None
+        self._conv_cache = collections.OrderedDict()
+        self._user_names = None
+        self._archive = None
+        self._archive_missing = False
+        self._archiver = None
 
         bot.memory.on_reload.add_observer(self.standardise_memory)
         bot.memory.on_reload.add_observer(self.load_from_memory)
+        bot.memory.on_reload.add_observer(self._reset_user_names)
 
     def __del__(self):
         """explicit cleanup"""
         self.bot.memory.on_reload.remove_observer(self.standardise_memory)
         self.bot.memory.on_reload.remove_observer(self.load_from_memory)
+        self.bot.memory.on_reload.remove_observer(self._reset_user_names)
 
     def stats(self):
         """log meta of the permamem"""
@@ -128,34 +755,50 @@ class ConversationMemory(object):
 
         convs = self.bot.memory.get_by_path(['convmem'])
         for conv_id, conv in convs.items():
+            migrated = dict(conv)
             # remove obsolete users list
-            if "users" in conv:
-                del conv["users"]
-
-            conv.setdefault("type", "unknown")
-            conv.setdefault("history", True)
-            conv.setdefault("participants", [])
-            conv.setdefault("link_sharing", False)
-            conv.setdefault("status", "DEFAULT")
-
-            if conv["type"] != "unknown":
-                continue
-
-            # guess the type
-            conv["type"] = "GROUP"
-            if len(conv["participants"]) != 1:
-                continue
-
-            path = ["user_data", conv["participants"][0], "1on1"]
-            if (self.bot.memory.exists(path)
-                    and self.bot.get_by_path(path) == conv_id):
-                conv["type"] = "ONE_TO_ONE"
+            migrated.pop("users", None)
+
+            migrated.setdefault("type", "unknown")
+            migrated.setdefault("history", True)
+            migrated.setdefault("participants", [])
+            migrated.setdefault("link_sharing", False)
+            migrated.setdefault("status", "DEFAULT")
+
+            if migrated["type"] == "unknown":
+                # guess the type
+                migrated["type"] = "GROUP"
+                if len(migrated["participants"]) == 1:
+                    path = ["user_data", migrated["participants"][0], "1on1"]
+                    if (self.bot.memory.exists(path)
+                            and self.bot.memory.get_by_path(path) == conv_id):
+                        migrated["type"] = "ONE_TO_ONE"
+
+            if migrated != conv:
+                self.bot.memory.set_by_path(["convmem", conv_id], migrated)
+
+        user_data = (self.bot.memory.get_by_path(['user_data'])
+                     if self.bot.memory.exists(['user_data']) else {})
+        compact_memory(user_data, convs, self._strings)
 
     async def load_from_memory(self):
         """load "persisted" conversations from memory.json into self.catalog
         complete internal user list by using "participants" keys
         """
+        users_to_fetch = set()
+        await self.load_catalog(users_to_fetch)
+
+        if users_to_fetch:
+            await self.get_users_from_query(users_to_fetch)
+
+    async def load_catalog(self, users_to_fetch):
+        """load the conversations from memory into self.catalog
+
+        yields to the event loop every INIT_CHUNK_SIZE conversations
 
+        Args:
+            users_to_fetch: set, add the ids of unknown or incomplete users
+        """
         convs = self.bot.memory.get_by_path(['convmem'])
         logger.debug("loading %s conversations from memory", len(convs))
 
@@ -163,9 +806,9 @@ class ConversationMemory(object):
         _users_incomplete = {}
         _users_unknown = []
 
-        _users_to_fetch = []
-
-        for convid, conv in convs.items():
+        for index, (convid, conv) in enumerate(list(convs.items())):
+            if index % INIT_CHUNK_SIZE == 0:
+                await asyncio.sleep(0)
             self.catalog[convid] = conv
             for chat_id in conv["participants"]:
                 try:
@@ -185,7 +828,7 @@ class ConversationMemory(object):
                     else:
                         _users_unknown.append(chat_id)
 
-                    _users_to_fetch.append(chat_id)
+                    users_to_fetch.add(chat_id)
 
         if _users_added:
             logger.info("added users: %s", _users_added)
@@ -196,54 +839,86 @@ class ConversationMemory(object):
         if _users_unknown:
             logger.warning("unknown users: %s", _users_unknown)
 
-        if _users_to_fetch:
-            await self.get_users_from_query(_users_to_fetch)
+    async def load_from_hangups(self, users_to_fetch=None):
+        """update the permamem from the user- and conv list of hangups
+
+        yields to the event loop every INIT_CHUNK_SIZE entrys
 
-    async def load_from_hangups(self):
-        """update the permamem from the user- and conv list of hangups"""
+        Args:
+            users_to_fetch: set, add the ids of unknown users instead of
+                requesting them per conversation
+        """
         users = self.bot._user_list.get_all()
         logger.info("loading %s users from hangups", len(users))
-        for user in users:
-            self.store_user_memory(user)
+        for index in range(0, len(users), INIT_CHUNK_SIZE):
+            await asyncio.sleep(0)
+            with self.bot.memory.transaction():
+                for user in users[index:index + INIT_CHUNK_SIZE]:
+                    self.store_user_memory(user)
 
+        fetch = set() if users_to_fetch is None else users_to_fetch
         conversations = self.bot._conv_list.get_all()
-        logger.info("loading %s conversations from hangups", len(conversations))
-        for conversation in conversations:
-            await self.update(conversation, source="init", automatic_save=False)
+        logger.info("loading %s conversations from hangups",
+                    len(conversations))
+        for index in range(0, len(conversations), INIT_CHUNK_SIZE):
+            await asyncio.sleep(0)
+            with self.bot.memory.transaction():
+                for conversation in conversations[index:
+                                                  index + INIT_CHUNK_SIZE]:
+                    self._update(conversation, "init", False, False, fetch)
 
-    async def get_users_from_query(self, chat_ids):
-        """retrieve definitive user data by requesting it from the server
+        if users_to_fetch is None and fetch:
+            await self.get_users_from_query(fetch)
 
-        Args:
-            chat_ids: list of string, a list of G+ ids
+    async def reconcile_startup(self, users_to_fetch):
+        """update the catalog with hangups data and complete the user list
 
-        Returns:
-            integer, number of updated users
+        all unknown users are requested with a single deduplicated lookup
+
+        Args:
+            users_to_fetch: set, ids of users that were found during the
+                catalog load
         """
+        try:
+            await self.load_from_hangups(users_to_fetch)
+            await load_missing_entrys(self.bot)
 
-        chat_ids = list(set(chat_ids))
+            if users_to_fetch:
+                await self.get_users_from_query(users_to_fetch)
 
-        updated_users = 0
-        logger.debug("getentitybyid(): %s", chat_ids)
+            self.stats()
+            self.bot.memory.save()
+            self._archiver = asyncio.ensure_future(self._run_archiver())
+        except asyncio.CancelledError:
+            raise
+        except Exception:                    # pylint:disable=broad-except
+            logger.exception("startup reconciliation failed")
+
+    def stop(self):
+        """cancel the background tasks and write the archive"""
+        for task in (self.startup, self._archiver):
+            if task is not None:
+                task.cancel()
+        for handle in self._reconcile_handles.values():
+            handle.cancel()
+        self._reconcile_handles.clear()
+        if self._archive is not None:
+            self._archive.flush()
+
+    async def get_users_from_query(self, chat_ids, force=False):
+        """retrieve definitive user data by requesting it from the server
 
-        request = hangups.hangouts_pb2.GetEntityByIdRequest(
-            request_header=self.bot.get_request_header(),
-            batch_lookup_spec=[
-                hangups.hangouts_pb2.EntityLookupSpec(gaia_id=chat_id)
-                for chat_id in chat_ids])
-        try:
-            response = await self.bot.get_entity_by_id(request)
-        except hangups.exceptions.NetworkError:
-            logger.exception("getentitybyid(): FAILED for %s", chat_ids)
-            return 0
+        lookups of concurrent calls are combined, see UserLookup
 
-        for entity in response.entity:
-            user = hangups.user.User.from_entity(entity, False)
-            self.bot._user_list._user_dict[user.id_] = user
+        Args:
+            chat_ids: list of string, a list of G+ ids
+            force: boolean, toggle to include ids the server did not resolve
+                recently
 
-            if self.store_user_memory(user):
-                updated_users += 1
-        self.bot.memory.save()
+        Returns:
+            integer, number of updated users
+        """
+        updated_users = await self._user_lookup.request(chat_ids, force)
 
         if updated_users:
             logger.info("getentitybyid(): %s users updated", updated_users)
@@ -259,14 +934,15 @@ class ConversationMemory(object):
             boolean, True if the permamem entry for the user changed
         """
         is_definitive = user.name_type == hangups.user.NameType.DEFAULT
+        chat_id = self._share(user.id_.chat_id)
 
         # reject an update if a valid user would be overwritten by a default one
-        cached = self.bot.user_memory_get(user.id_.chat_id, "_hangups") or {}
+        cached = self.bot.user_memory_get(chat_id, "_hangups") or {}
         if cached and cached.get("is_definitive", 0) > is_definitive:
             return False
 
         user_dict = {
-            "chat_id": user.id_.chat_id,
+            "chat_id": chat_id,
             "full_name": user.full_name,
             "first_name": user.first_name,
             "photo_url": user.photo_url,
@@ -292,18 +968,160 @@ class ConversationMemory(object):
             key = ''
 
         if changed:
-            logger.info(message, key, user.full_name, user.id_.chat_id)
+            logger.info(message, key, user.full_name, chat_id)
             user_dict["updated"] = datetime.now().strftime("%Y%m%d%H%M%S")
-            self.bot.user_memory_set(user.id_.chat_id, "_hangups", user_dict)
+            self.bot.user_memory_set(chat_id, "_hangups", user_dict)
+            self.reindex_user(chat_id)
         return changed
 
-    async def update(self, conv, source="unknown", automatic_save=True):
+    @property
+    def user_names(self):
+        """get the name index of all users with cached hangups data
+
+        the index is built on first access
+
+        Returns:
+            UserNameIndex instance
+        """
+        if self._user_names is None:
+            index = UserNameIndex()
+            for chat_id, user_data in self.bot.memory["user_data"].items():
+                if isinstance(user_data, dict) and "_hangups" in user_data:
+                    index.set_user(chat_id,
+                                   user_data["_hangups"]["full_name"],
+                                   user_data.get("nickname"))
+            self._user_names = index
+        return self._user_names
+
+    def reindex_user(self, chat_id):
+        """update the name index entry of a user after a name change
+
+        Args:
+            chat_id: string, G+ id of the user
+        """
+        if self._user_names is None:
+            # not built yet
+            return
+        cached = self.bot.user_memory_get(chat_id, "_hangups")
+        if cached is None:
+            self._user_names.remove_user(chat_id)
+            return
+        self._user_names.set_user(chat_id, cached["full_name"],
+                                  self.bot.user_memory_get(chat_id, "nickname"))
+
+    def _reset_user_names(self, changed=None):
+        """drop the name index after the user data was reloaded
+
+        Args:
+            changed: iterable of changed top level keys, None for all
+        """
+        if changed is None or "user_data" in changed:
+            self._user_names = None
+
+    async def update(self, conv, source="unknown", automatic_save=True,
+                     force=False, users_to_fetch=None):
         """update conversation memory based on supplied hangups Conversation
 
+        the memory is saved once after all user and conversation changes,
+        unknown users are requested afterwards.
+        A conversation with an unchanged fingerprint is skipped, a full update
+        is scheduled in the background once per RECONCILE_INTERVAL instead
+
         Args:
             conv: hangups.conversation.Conversation instance
             source: string, origin of the conv, 'event', 'init'
             automatic_save: boolean, toggle to dump the memory on changes
+            force: boolean, toggle to skip the fingerprint check
+            users_to_fetch: set, add the ids of unknown users instead of
+                requesting them
+
+        Returns:
+            boolean, True on Conversation/User change, False on no changes
+        """
+        fetch = set() if users_to_fetch is None else users_to_fetch
+        changed = self._update(conv, source, automatic_save, force, fetch)
+        if users_to_fetch is None and fetch:
+            await self.get_users_from_query(fetch)
+        return changed
+
+    def _update(self, conv, source, automatic_save, force, users_to_fetch):
+        """update the conversation memory if the fingerprint changed
+
+        Args:
+            conv: hangups.conversation.Conversation instance
+            source: string, origin of the conv, 'event', 'init'
+            automatic_save: boolean, toggle to dump the memory on changes
+            force: boolean, toggle to skip the fingerprint check
+            users_to_fetch: set, add the ids of unknown users
+
+        Returns:
+            boolean, True on Conversation/User change, False on no changes
+        """
+        if conv.id_ not in self.catalog:
+            self.restore_conv(conv.id_)
+
+        fingerprint = conversation_fingerprint(conv)
+        if (not force and conv.id_ in self.catalog
+                and self._fingerprints.get(conv.id_) == fingerprint):
+            self._schedule_reconcile(conv)
+            self._touch(conv.id_)
+            return False
+
+        with self.bot.memory.transaction():
+            changed = self._store_conv(conv, source, automatic_save,
+                                       users_to_fetch)
+            self._touch(conv.id_)
+
+        self._fingerprints[conv.id_] = fingerprint
+        self._reconciled[conv.id_] = time.time()
+        if changed:
+            self._conv_cache.pop(conv.id_, None)
+        return changed
+
+    def _touch(self, conv_id):
+        """mark a conversation as active today, see .archive_inactive
+
+        Args:
+            conv_id: string, hangouts conversation identifier
+        """
+        if not self.bot.config.get_option("memory-archive_days"):
+            return
+        today = datetime.now().strftime("%Y%m%d")
+        entry = self.catalog.get(conv_id)
+        if entry is None or entry.get("last_seen") == today:
+            return
+        self.bot.memory.set_by_path(["convmem", conv_id, "last_seen"], today)
+        self.bot.memory.save()
+
+    def _schedule_reconcile(self, conv):
+        """schedule a full update if the last one is outdated
+
+        Args:
+            conv: hangups.conversation.Conversation instance
+        """
+        conv_id = conv.id_
+        if (conv_id in self._reconcile_handles or
+                time.time() - self._reconciled.get(conv_id, 0)
+                < RECONCILE_INTERVAL):
+            return
+
+        def _reconcile():
+            """run the full update"""
+            self._reconcile_handles.pop(conv_id, None)
+            asyncio.ensure_future(self.update(conv, source="event",
+                                              force=True))
+
+        self._reconcile_handles[conv_id] = asyncio.get_event_loop().call_later(
+            RECONCILE_DELAY, _reconcile)
+
+    def _store_conv(self, conv, source, automatic_save, users_to_fetch):
+        """update conversation memory based on supplied hangups Conversation
+
+        Args:
+            conv: hangups.conversation.Conversation instance
+            source: string, origin of the conv, 'event', 'init'
+            automatic_save: boolean, toggle to dump the memory on changes
+            users_to_fetch: set, collect the ids of unknown users
 
         Returns:
             boolean, True on Conversation/User change, False on no changes
@@ -334,7 +1152,7 @@ class ConversationMemory(object):
 
         for user in conv.users:
             if not user.is_self:
-                memory["participants"].append(user.id_.chat_id)
+                memory["participants"].append(self._share(user.id_.chat_id))
 
             if user.name_type == hangups.user.NameType.DEFAULT:
                 _users_to_fetch.append(user.id_.chat_id)
@@ -344,7 +1162,7 @@ class ConversationMemory(object):
         if _users_to_fetch:
             logger.info("unknown users returned from %s (%s): %s",
                         conv_title, conv.id_, _users_to_fetch)
-            await self.get_users_from_query(_users_to_fetch)
+            users_to_fetch.update(_users_to_fetch)
 
         conv_changed = True
         if cached:
@@ -390,6 +1208,11 @@ class ConversationMemory(object):
                 self.bot.memory.pop_by_path(["convmem", conv_id])
                 self.bot.memory.save()
                 del self.catalog[conv_id]
+                self._fingerprints.pop(conv_id, None)
+                self._conv_cache.pop(conv_id, None)
+                handle = self._reconcile_handles.pop(conv_id, None)
+                if handle is not None:
+                    handle.cancel()
 
             else:
                 logger.warning("cannot remove conv: %s %s %s",
@@ -398,164 +1221,348 @@ class ConversationMemory(object):
         else:
             logger.warning("cannot remove: %s, not found", conv_id)
 
-    def get(self, search="", **kwargs):          #pylint:disable=too-many-locals
+    @property
+    def archive_path(self):
+        """get the file path of the archive
+
+        Returns:
+            string, path next to the memory file
+        """
+        return os.path.splitext(self.bot.memory.filename)[0] + '-archive.json'
+
+    def _get_archive(self, create=False):
+        """load the archive on first use
+
+        Args:
+            create: boolean, toggle to create a missing archive
+
+        Returns:
+            config.Config instance or None if no archive exists
+
+        Raises:
+            IOError: the archive is not readable
+            ValueError: the archive is not valid json
+        """
+        if self._archive is None:
+            if not create and (self._archive_missing
+                               or not os.path.isfile(self.archive_path)):
+                self._archive_missing = True
+                return None
+            archive = config.Config(self.archive_path, failsafe_backups=1,
+                                    save_delay=1, serializer='gzip')
+            archive.logger = self.bot.memory.logger
+            archive.load()
+            archive.ensure_path(["convmem"])
+            archive.ensure_path(["user_data"])
+            self._archive = archive
+        return self._archive
+
+    def archive_inactive(self, days):
+        """move conversations and users without activity to the archive
+
+        a conversation is inactive if no event was seen for the given days, a
+        user if the hangups data did not change in that time and the user is
+        not a participant of an active conversation. Conversations without a
+        recorded activity are marked as seen today instead
+
+        Args:
+            days: integer, minimum age of the last activity
+
+        Returns:
+            tuple of int, number of archived conversations and users
+
+        Raises:
+            IOError: the archive is not readable
+            ValueError: the archive is not valid json
+        """
+        today = datetime.now()
+        cutoff = (today - timedelta(days=days)).strftime("%Y%m%d")
+        today = today.strftime("%Y%m%d")
+        archive = self._get_archive(create=True)
+        convmem = self.bot.memory.get_by_path(["convmem"])
+        user_data = (self.bot.memory.get_by_path(["user_data"])
+                     if self.bot.memory.exists(["user_data"]) else {})
+
+        with self.bot.memory.transaction(), archive.transaction():
+            conv_ids = []
+            seeded = 0
+            for conv_id, conv in convmem.items():
+                last_seen = conv.get("last_seen")
+                if last_seen is None:
+                    # the activity before the first sweep is unknown
+                    self.bot.memory.set_by_path(
+                        ["convmem", conv_id, "last_seen"], today)
+                    seeded += 1
+                elif last_seen < cutoff:
+                    conv_ids.append(conv_id)
+
+            for conv_id in conv_ids:
+                archive.set_by_path(["convmem", conv_id],
+                                    self.bot.memory.pop_by_path(
+                                        ["convmem", conv_id]))
+                self.catalog.pop(conv_id, None)
+                self._fingerprints.pop(conv_id, None)
+                self._conv_cache.pop(conv_id, None)
+                self._strings.pop(conv_id, None)
+
+            chat_ids = []
+            for chat_id, user in user_data.items():
+                if not isinstance(user, dict) or "_hangups" not in user:
+                    continue
+                cached = user["_hangups"]
+                if (cached.get("is_self")
+                        or chat_id in self.catalog.participants
+                        or (str(cached.get("updated", ""))[:8] or cutoff)
+                        >= cutoff):
+                    continue
+                chat_ids.append(chat_id)
+
+            for chat_id in chat_ids:
+                archive.set_by_path(["user_data", chat_id],
+                                    self.bot.memory.pop_by_path(
+                                        ["user_data", chat_id]))
+                if self._user_names is not None:
+                    self._user_names.remove_user(chat_id)
+                self._strings.pop(chat_id, None)
+
+            if conv_ids or chat_ids or seeded:
+                self.bot.memory.save()
+            if conv_ids or chat_ids:
+                archive.save()
+
+        logger.info("archived %s conversations and %s users",
+                    len(conv_ids), len(chat_ids))
+        return len(conv_ids), len(chat_ids)
+
+    def restore_conv(self, conv_id):
+        """move a conversation from the archive back into the memory
+
+        Args:
+            conv_id: string, hangouts conversation identifier
+
+        Returns:
+            boolean, True if the conversation was archived, otherwise False
+        """
+        archive = self._get_archive()
+        if archive is None or not archive.exists(["convmem", conv_id]):
+            return False
+        entry = archive.pop_by_path(["convmem", conv_id])
+        archive.save()
+        with self.bot.memory.transaction():
+            self.bot.memory.set_by_path(["convmem", conv_id], entry)
+            self.bot.memory.save()
+            self.catalog[conv_id] = entry
+            # the participants were archived once the conv became inactive
+            for chat_id in entry.get("participants", ()):
+                if not self.bot.memory.exists(["user_data", chat_id]):
+                    self.restore_user(chat_id)
+        logger.info("restored conv %s from the archive", conv_id)
+        return True
+
+    def restore_user(self, chat_id):
+        """move a user from the archive back into the memory
+
+        Args:
+            chat_id: string, G+ id of the user
+
+        Returns:
+            boolean, True if the user was archived, otherwise False
+        """
+        archive = self._get_archive()
+        if archive is None or not archive.exists(["user_data", chat_id]):
+            return False
+        entry = archive.pop_by_path(["user_data", chat_id])
+        archive.save()
+        self.bot.memory.set_by_path(["user_data", chat_id], entry)
+        self.bot.memory.save()
+        self.reindex_user(chat_id)
+        logger.info("restored user %s from the archive", chat_id)
+        return True
+
+    def get_archived_users(self):
+        """get the memory entrys of the archived users without restoring them
+
+        Returns:
+            dict, G+ ids as keys and the archived entrys as values, do not
+                change the entrys, use .restore_user first
+        """
+        archive = self._get_archive()
+        if archive is None:
+            return {}
+        return archive.get_by_path(["user_data"])
+
+    def archive_stats(self):
+        """get the size of the archive
+
+        Returns:
+            dict, the number of archived "convs" and "users" and the file
+                "size" in bytes
+        """
+        archive = self._get_archive()
+        if archive is None:
+            return {"convs": 0, "users": 0, "size": 0}
+        try:
+            size = os.path.getsize(self.archive_path)
+        except OSError:
+            size = 0
+        return {"convs": len(archive.get_by_path(["convmem"])),
+                "users": len(archive.get_by_path(["user_data"])),
+                "size": size}
+
+    async def _run_archiver(self):
+        """archive inactive entrys once per ARCHIVE_INTERVAL
+
+        the first sweep runs one interval after the start to let the bot
+        record the activity of the conversations first
+        """
+        while True:
+            await asyncio.sleep(ARCHIVE_INTERVAL)
+            days = self.bot.config.get_option("memory-archive_days")
+            if days:
+                try:
+                    self.archive_inactive(days)
+                except (IOError, ValueError):
+                    logger.exception("archive sweep failed")
+
+    def get_hangups_conversation(self, conv_id):
+        """get a HangupsConversation, use a cached one if it is still current
+
+        a cached conversation is replaced once hangups has a different
+        conversation record for the id or .update() reports a change. The
+        cache holds the CONV_CACHE_SIZE recently used conversations
+
+        Args:
+            conv_id: string, hangouts conversation identifier
+
+        Returns:
+            HangupsConversation instance
+        """
+        cached = self._conv_cache.get(conv_id)
+        if cached is not None:
+            try:
+                current = self.bot._conv_list.get(conv_id)._conversation
+            except KeyError:
+                current = cached._conversation
+            if current is cached._conversation:
+                self._conv_cache.move_to_end(conv_id)
+                return cached
+
+        conv = HangupsConversation(self.bot, conv_id)
+        self._conv_cache[conv_id] = conv
+        self._conv_cache.move_to_end(conv_id)
+        if len(self._conv_cache) > CONV_CACHE_SIZE:
+            self._conv_cache.popitem(last=False)
+        return conv
+
+    def get(self, search="", **kwargs):
         """get conversations matching a filter of terms
 
         supports sequential boolean operations,
         each term must be enclosed with brackets "( ... )"
 
+        the terms are evaluated with the indexes of the .catalog, the
+        compiled filter is cached
+
         Args:
             search: string, filter for conv title, id, tags, type, user count
             kwargs: dict, legacy to catch the keyword argument 'filter'
 
         Returns:
             dict, conv ids as keys and permamem entry of each conv as value
-        """
-        def parse_request(locals_):
-            """split multiple querys to their filter functions and queryvalue
-
-            Args:
-                locals_: dict, locals of .get to access all filter functions
-
-            Returns:
-                list, a list of tuple,
-                (operator : string, query: string, <filter func> : callable)
-                invalid filter querys result in a string as filter func
-            """
-            raw_filter = (kwargs.get('filter') or search).strip()
-            terms = []
-            operator = "start"
-            while raw_filter.startswith("("):
-                tokens = re.split(r"(?<!\\)(?:\\\\)*\)", raw_filter, maxsplit=1)
-                terms.append((operator, tokens[0][1:]))
-                if len(tokens) != 2:
-                    break
-                raw_filter = tokens[1]
-                if not raw_filter:
-                    # finished consuming entire string
-                    pass
-                elif re.match(r"^\s*and\s*\(", raw_filter, re.IGNORECASE):
-                    operator = "and"
-                    raw_filter = tokens[1][raw_filter.index('('):].strip()
-                elif re.match(r"^\s*or\s*\(", raw_filter, re.IGNORECASE):
-                    operator = "or"
-                    raw_filter = tokens[1][raw_filter.index('('):].strip()
-                else:
-                    raise ValueError('invalid boolean operator near "%s"' %
-                                     raw_filter.strip())
-
-            if raw_filter or not terms:
-                # second condition is to ensure at least one term, even if blank
-                terms.append((operator, raw_filter))
-
-            logger.debug(".get() with terms: %s", terms)
 
-            parsed = []
-            for operator, term in terms:
-                if ":" in term:
-                    type_, query = term.split(":", 1)
-                    parsed.append((operator, query, locals_.get("_" + type_,
-                                                                type_)))
-                else:
-                    parsed.append((operator, term, _id))
-            return parsed
-
-        #### begin search function definitions ###
-        # NOTE: more filter can be added here
-        # a search for "querytype:queryvalue" requires a function with a
-        # footprint like: _querytype(convid, convdata, queryvalue)
-        def _text(dummy0, convdata, query):
-            """check the conv title for the given query
-
-            Returns:
-                boolean, True if the query is part of the title otherwise False
-            """
-            query = query.lower()
-            return (query in convdata["title"].lower()
-                    or query in convdata["title"].replace(" ", "").lower())
-
-        def _id(convid, dummy0, query):
-            """check if the query matches with the convid
-
-            Returns:
-                boolean, True if the convid and query match otherwise False
-            """
-            return convid == query
-
-        def _chat_id(dummy0, convdata, query):
-            """check the user chat ids for a match with the query
-
-            Returns:
-                boolean, True if any chat_id matches the query, otherwise False
-            """
-            for chat_id in convdata["participants"]:
-                if query == chat_id:
-                    return True
-
-        def _type(dummy0, convdata, query):
-            """check if the conversation type matches with the query
-
-            Returns:
-                boolean, True if the type matches otherwise False
-            """
-            return convdata["type"] == query.upper()
-
-        def _minusers(dummy0, convdata, query):
-            """check if the user count of a conv is not below the query value
-
-            Returns:
-                boolean, False if fewer users are in the conv, otherwise True
-            """
-            return len(convdata["participants"]) >= int(query)
-
-        def _maxusers(dummy0, convdata, query):
-            """check if the user count of a conv is not above the query value
-
-            Returns:
-                boolean, False if more users are in the conv, otherwise True
-            """
-            return len(convdata["participants"]) <= int(query)
-
-        def _random(dummy0, dummy1, query):
-            """check the query value against a random number between 0 and 1
-
-            Returns:
-                boolean, True if the query value is greater, otherwise False
-            """
-            return random.random() < float(query)
-
-        def _tag(convid, dummy0, query):
-            """check if the query is a registered tag and the conv is tagged
-
-            Returns:
-                boolean, True if the query is a tag and the conv is tagged w/ it
-            """
-            return (query in self.bot.tags.indices["tag-convs"] and
-                    convid in self.bot.tags.indices["tag-convs"][query])
-
-        ### end search function definitions ###
-        sourcelist = self.catalog.copy()
-        matched = {}
-
-        for operator, query, func in parse_request(locals()):
-            if not callable(func):
+        Raises:
+            ValueError: invalid boolean operator or invalid filter value
+        """
+        catalog = self.catalog
+        # None represents all conversations
+        sourcelist = None
+        matched = set()
+
+        for operator, type_, query in compile_filter(kwargs.get('filter')
+                                                     or search):
+            if type_.startswith("invalid:"):
                 logger.warning('ConversationMemory.get: invalid filter "%s:%s"',
-                               func, query)
+                               type_[8:], query)
                 continue
 
             if operator == "and":
                 sourcelist = matched
-                matched = {}
+                matched = set()
 
-            if not query:
+            if type_ == "all":
                 # return everything
                 matched = sourcelist
                 continue
 
-            for convid, convdata in sourcelist.items():
-                if func(convid, convdata, query):
-                    matched[convid] = convdata
-        return matched
+            if matched is None:
+                # already matching all, nothing can be added
+                continue
+
+            if type_ == "text":
+                found = catalog.match_text(query, sourcelist)
+            elif type_ == "random":
+                found = set(conv_id for conv_id in (catalog if sourcelist is None
+                                                    else sourcelist)
+                            if random.random() < query)
+            else:
+                if type_ == "id":
+                    found = (query,) if query in catalog else ()
+                elif type_ == "chat_id":
+                    found = catalog.participants.get(query, ())
+                elif type_ == "type":
+                    found = catalog.types.get(query, ())
+                elif type_ == "minusers":
+                    found = catalog.match_users(minimum=query)
+                elif type_ == "maxusers":
+                    found = catalog.match_users(maximum=query)
+                else:
+                    # tag, the index is maintained separately
+                    found = [conv_id for conv_id in
+                             self.bot.tags.indices["tag-convs"].get(query, ())
+                             if conv_id in catalog]
+
+                found = (set(found) if sourcelist is None
+                         else sourcelist.intersection(found))
+
+            matched.update(found)
+
+        if matched is None:
+            # keep the order of the catalog for unfiltered requests
+            return dict(catalog.items())
+        return {conv_id: catalog[conv_id] for conv_id in matched}
+
+    def get_participants(self, conv_ids):
+        """get the unique participants of one or multiple conversations
+
+        Args:
+            conv_ids: string or iterable of strings, conversation identifiers
+
+        Returns:
+            set of chat ids
+
+        Raises:
+            KeyError: a conversation is unknown
+        """
+        if isinstance(conv_ids, str):
+            conv_ids = (conv_ids,)
+        members = []
+        for conv_id in conv_ids:
+            if conv_id not in self.catalog:
+                # an archived conversation is restored like in .__getitem__
+                self.restore_conv(conv_id)
+            members.append(self.catalog.members(conv_id))
+        return set().union(*members)
+
+    def get_conversations_of(self, chat_id):
+        """get the conversations a user participates in
+
+        Args:
+            chat_id: string, G+ id of the user
+
+        Returns:
+            frozenset of conv ids
+        """
+        return self.catalog.memberships(chat_id)
 
     def get_name(self, conv, fallback=SENTINEL):
         """get the name of a conversation
@@ -590,6 +1597,11 @@ class ConversationMemory(object):
         return iter(self.catalog)
 
     def __getitem__(self, key):
+        try:
+            return self.catalog[key]
+        except KeyError:
+            if not self.restore_conv(key):
+                raise
         return self.catalog[key]
 
     def __setitem__(self, key, value):
@@ -257,16 +257,18 @@ def register_help(source, name=None):
         raise ValueError('check args')
     tracking.bot.memory.set_defaults(source, ['command_help'])
 
-def register_handler(function, type="message", priority=50):
+def register_handler(function, type="message", priority=50, concurrent=False):
     """register external message handler
 
     Args:
         function: callable, with signature: function(bot, event, command)
         name: string, key in handler.EventHandler.pluggables, event type
         priority: int, change the sequence of handling the event
+        concurrent: boolean, toggle to run the handler in parallel to other
+            concurrent handlers of the same priority
     """
     bot_handlers = tracking.bot._handlers
-    bot_handlers.register_handler(function, type, priority)
+    bot_handlers.register_handler(function, type, priority, concurrent)
 
 def register_shared(identifier, objectref):
     """register a shared object to be called later
@@ -640,11 +642,7 @@ async def unload(bot, module_path):
                 logger.debug("deregistering tagged command %s", command_name)
                 del command.command_tagsets[command_name]
 
-    for type_ in bot._handlers.pluggables:
-        for handler in bot._handlers.pluggables[type_]:
-            if handler[2]["module.path"] == module_path:
-                logger.debug("removing handler %s %s", type_, handler)
-                bot._handlers.pluggables[type_].remove(handler)
+    bot._handlers.unregister_handlers(module_path)
 
     shared = plugin["shared"]
     for shared_def in shared:
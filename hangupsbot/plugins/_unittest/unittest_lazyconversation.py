@@ -0,0 +1,47 @@
+"""placeholder conversation unit test
+* materialize a LazyConversation that is registered in the conv list
+"""
+
+import logging
+
+import plugins
+
+from hangups_conversation import HangupsConversation, LazyConversation
+
+
+logger = logging.getLogger(__name__)
+
+
+def _initialise():
+    plugins.register_admin_command(["lazyconversation"])
+
+
+def lazyconversation(bot, event, *args):
+    """materialize a placeholder of the current or a given conversation
+
+    the placeholder replaces the registered conversation during the test and
+    is replaced by the built conversation on first access
+    """
+    # pylint:disable=protected-access
+    conv_id = args[0] if args else event.conv_id
+    conv_dict = bot._conv_list._conv_dict
+    original = conv_dict.get(conv_id)
+
+    placeholder = LazyConversation(bot, conv_id)
+    conv_dict[conv_id] = placeholder
+    try:
+        conv = placeholder.materialize()
+        assert isinstance(conv, HangupsConversation), repr(conv)
+        assert conv.id_ == conv_id, conv.id_
+        assert conv_dict[conv_id] is conv, repr(conv_dict[conv_id])
+        assert placeholder.materialize() is conv
+        assert placeholder.users == conv.users
+        logger.info("lazyconversation: %s materialized with %s users",
+                    conv_id, len(conv.users))
+    except (AssertionError, RecursionError):
+        logger.exception("lazyconversation: %s failed", conv_id)
+    finally:
+        if original is None:
+            conv_dict.pop(conv_id, None)
+        else:
+            conv_dict[conv_id] = original
@@ -71,7 +71,7 @@ def submemoryclear(bot, event, *args):
 
 def submemoryset(bot, event, *args):
     timestamp = time.time()
-    bot.memory["unittest-submemory"]["timestamp"] = str(timestamp)
+    bot.memory.set_by_path(["unittest-submemory", "timestamp"], str(timestamp))
     logger.info("submemoryset: {}".format(timestamp))
 
 
@@ -80,7 +80,9 @@ def submemoryget(bot, event, *args):
 
 
 def submemorypop(bot, event, *args):
-    the_string = bot.memory["unittest-submemory"].pop("timestamp")
+    submemory = bot.memory["unittest-submemory"]
+    the_string = submemory.pop("timestamp")
+    bot.memory.set_by_path(["unittest-submemory"], submemory)
     logger.info("submemorypop: {}".format(the_string))
 
 
@@ -0,0 +1,127 @@
+"""memory storage unit test
+all these commands work on a temporary storage
+* deleting a top level entry right after a load (memorystorage test)
+* removing the shard file of a deleted top level entry (memorystorage test)
+* saving a dict that was changed in place (memorystorage test)
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+
+import plugins
+
+from config import Config
+from config_sharded import ShardedConfig
+from config_sqlite import SQLiteConfig
+
+
+logger = logging.getLogger(__name__)
+
+
+def _initialise():
+    plugins.register_admin_command(["memorystorage"])
+
+
+def _delete_after_load(factory, path, delete):
+    """delete a top level entry right after a load and reload the storage
+
+    Args:
+        factory: callable, called with the path, returns a Config instance
+        path: string, path of the storage
+        delete: callable, called with the storage and the key to delete
+
+    Returns:
+        Config instance, the reloaded storage
+    """
+    storage = factory(path)
+    storage.load()
+    storage.set_by_path(["unittest-a"], {"x": 1})
+    storage.set_by_path(["unittest-b"], 2)
+    storage.flush()
+
+    storage = factory(path)
+    storage.load()
+    delete(storage, "unittest-a")
+    storage.save(delay=False)
+    storage.flush()
+
+    storage = factory(path)
+    storage.load()
+    return storage
+
+
+def _change_in_place(factory, path):
+    """change a loaded dict in place, save it and reload the storage
+
+    Args:
+        factory: callable, called with the path, returns a Config instance
+        path: string, path of the storage
+
+    Returns:
+        any type, the changed value after the reload
+    """
+    storage = factory(path)
+    storage.load()
+    storage.set_by_path(["unittest-a"], {"x": 1})
+    storage.flush()
+
+    storage = factory(path)
+    storage.load()
+    storage.get_by_path(["unittest-a"])["x"] = 2
+    storage.save(delay=False)
+    storage.flush()
+
+    storage = factory(path)
+    storage.load()
+    return storage.get_by_path(["unittest-a", "x"])
+
+
+def memorystorage(*dummys):
+    """delete top level entrys right after a load and change a dict in place,
+    check the reloaded data
+
+    the storages are created in a temporary directory
+    """
+    def _del(storage, key):
+        del storage[key]
+
+    def _pop(storage, key):
+        storage.pop_by_path([key])
+
+    def _untracked(storage, key):
+        del storage.config[key]
+
+    factorys = {
+        "json": Config,
+        "json lazy": lambda path: Config(path, eager_sections=()),
+        "json journal": lambda path: Config(path, journal_size=1024),
+        "sqlite": SQLiteConfig,
+        "sharded": ShardedConfig,
+        "sharded lazy": lambda path: ShardedConfig(path, eager_sections=()),
+    }
+    deletes = {"del": _del, "pop": _pop, "untracked": _untracked}
+
+    directory = tempfile.mkdtemp()
+    try:
+        for name, factory in sorted(factorys.items()):
+            for label, delete in sorted(deletes.items()):
+                path = os.path.join(directory, "%s-%s.json" % (name, label))
+                storage = _delete_after_load(factory, path, delete)
+                keys = sorted(storage.config)
+                assert keys == ["unittest-b"], (name, label, keys)
+                if isinstance(storage, ShardedConfig):
+                    files = sorted(os.listdir(storage.directory))
+                    assert files == ["unittest-b.json"], (name, label, files)
+        logger.info("memorystorage: deleted entrys stay deleted")
+
+        for name, factory in sorted(factorys.items()):
+            path = os.path.join(directory, "%s-in-place.json" % name)
+            value = _change_in_place(factory, path)
+            assert value == 2, (name, value)
+        logger.info("memorystorage: changes in place are saved")
+    except AssertionError:
+        logger.exception("memorystorage: failed")
+    finally:
+        shutil.rmtree(directory)
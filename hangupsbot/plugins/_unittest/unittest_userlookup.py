@@ -0,0 +1,48 @@
+"""user lookup unit test
+* cancelling one of two callers that wait for the same user (userlookup test)
+"""
+
+import asyncio
+import logging
+
+import plugins
+
+from permamem import UserLookup
+
+
+logger = logging.getLogger(__name__)
+
+
+def _initialise():
+    plugins.register_admin_command(["userlookup"])
+
+
+class _SlowLookup(UserLookup):
+    """resolve every queued user after a delay without a server request"""
+    async def _lookup(self, chunk):
+        await asyncio.sleep(0.1)
+        for chat_id, future in chunk.items():
+            if self._running.get(chat_id) is future:
+                del self._running[chat_id]
+            if not future.done():
+                future.set_result(True)
+
+
+async def userlookup(bot, *dummys):
+    """cancel one of two concurrent lookups of the same user
+
+    the other caller must still receive the result of the shared lookup
+    """
+    lookup = _SlowLookup(bot.conversations)
+    first = asyncio.ensure_future(lookup.request(["unittest"]))
+    second = asyncio.ensure_future(lookup.request(["unittest"]))
+    # let both callers queue the id
+    await asyncio.sleep(0)
+    first.cancel()
+    try:
+        updated = await second
+        assert updated == 1, updated
+        assert first.cancelled(), first
+        logger.info("userlookup: the second caller got its result")
+    except (AssertionError, asyncio.CancelledError):
+        logger.exception("userlookup: failed")
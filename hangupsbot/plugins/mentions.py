@@ -73,9 +73,9 @@ def mention(bot, event, *args):
             for rooms_group in sync_room_list:
                 if event.conv_id in rooms_group:
                     """current conversation is part of a syncroom group, add "external" users"""
-                    for syncedroom in rooms_group:
-                        if event.conv_id is not syncedroom:
-                            users_in_chat += bot.get_users_in_conversation(syncedroom)
+                    users_in_chat += bot.get_users_in_conversation(
+                        [syncedroom for syncedroom in rooms_group
+                         if syncedroom != event.conv_id])
                     users_in_chat = list(set(users_in_chat)) # make unique
                     logger.debug("@mention in a syncroom: {} user(s) present".format(len(users_in_chat)))
                     break
@@ -451,6 +451,11 @@ def setnickname(bot, event, *args):
             usernick = bot.memory.get_suboption("user_data", userchatid, "nickname")
             if usernick:
                 nicks[userchatid] = usernick.lower()
+        # archived users keep their nickname
+        for userchatid, entry in bot.conversations.get_archived_users().items():
+            usernick = entry.get("nickname")
+            if usernick and userchatid not in nicks:
+                nicks[userchatid] = usernick.lower()
 
     # is the user trying to re-set his own nickname? - don't do anything if that is the case
     if event.user.id_.chat_id in nicks:
@@ -467,6 +472,7 @@ def setnickname(bot, event, *args):
     bot.initialise_memory(event.user.id_.chat_id, "user_data")
 
     bot.memory.set_by_path(["user_data", event.user.id_.chat_id, "nickname"], nickname)
+    bot.conversations.reindex_user(event.user.id_.chat_id)
 
     # Update nicks cache with new nickname
     nicks[event.user.id_.chat_id] = nickname
@@ -36,7 +36,8 @@ class SpotifyPlaylist:
 
 
 def _initialise():
-    plugins.register_handler(_watch_for_music_link, type="message")
+    plugins.register_handler(_watch_for_music_link, type="message",
+                             concurrent=True)
     plugins.register_user_command(["spotify"])
 
 
@@ -41,9 +41,9 @@ def _handle_keyword(bot, event, command, include_event_user=False):
         syncouts = bot.get_config_option('sync_rooms') or []
         for sync_room_list in syncouts:
             if event.conv_id in sync_room_list:
-                for syncedroom in sync_room_list:
-                    if event.conv_id not in syncedroom:
-                        users_in_chat += bot.get_users_in_conversation(syncedroom)
+                users_in_chat += bot.get_users_in_conversation(
+                    [syncedroom for syncedroom in sync_room_list
+                     if syncedroom != event.conv_id])
                 users_in_chat = list(set(users_in_chat)) # make unique
 
     event_text = re.sub(r"\s+", " ", event.text)
@@ -227,9 +227,10 @@ class tags:
 
         records_removed = 0
         if remove:
-            for args in remove:
-                if self.remove(*args):
-                    records_removed = records_removed + 1
+            with self.bot.memory.transaction():
+                for args in remove:
+                    if self.remove(*args):
+                        records_removed = records_removed + 1
 
         return records_removed
 
@@ -0,0 +1,171 @@
+"""benchmark the file formats and the in-process size of the bot memory
+usage: memory-benchmark.py [-h] [-u USERS] [-c CONVS] [-r RUNS]
+
+optional arguments:
+  -h, --help            show this help message and exit
+  -u USERS, --users USERS
+                        number of synthetic users
+  -c CONVS, --convs CONVS
+                        number of synthetic conversations
+  -r RUNS, --runs RUNS  repetitions per measurement, the best run is shown
+
+example usage:
+python3 tests/memory-benchmark.py --users 50000
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import string
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config                                   # pylint:disable=wrong-import-position
+
+
+def _random_name(length):
+    return ''.join(random.choice(string.ascii_lowercase) for _ in range(length))
+
+
+def build_memory(users, convs):
+    """create a memory structure similar to a long running bot
+
+    Args:
+        users: int, number of user entrys
+        convs: int, number of conversation entrys
+
+    Returns:
+        dict, the synthetic memory
+    """
+    chat_ids = [str(10**20 + index) for index in range(users)]
+    user_data = {}
+    for chat_id in chat_ids:
+        full_name = '%s %s' % (_random_name(6).title(), _random_name(8).title())
+        user_data[chat_id] = {
+            "_hangups": {
+                "chat_id": chat_id,
+                "full_name": full_name,
+                "first_name": full_name.split()[0],
+                "photo_url": "//lh3.googleusercontent.com/%s/photo.jpg"
+                             % _random_name(24),
+                "emails": ["%s@example.com" % _random_name(8)],
+                "is_self": False,
+                "is_definitive": True,
+                "updated": "20170101000000"},
+            "nickname": _random_name(5),
+            "1on1": _random_name(26)}
+
+    convmem = {}
+    for index in range(convs):
+        conv_id = 'Ugw%s' % _random_name(25)
+        participants = random.sample(chat_ids, min(len(chat_ids), 20))
+        convmem[conv_id] = {
+            "title": ' '.join(_random_name(6) for _ in range(3)),
+            "source": "hangups",
+            "history": index % 2 == 0,
+            "participants": participants,
+            "type": "GROUP",
+            "link_sharing": False,
+            "status": "DEFAULT",
+            "updated": "20170101000000"}
+
+    return {"user_data": user_data, "convmem": convmem,
+            "conv_data": {conv_id: {"tags": ["tag"]} for conv_id in convmem}}
+
+
+def measure(func, runs):
+    """run the func multiple times
+
+    Args:
+        func: callable without arguments
+        runs: int, number of repetitions
+
+    Returns:
+        float, the fastest run in seconds
+    """
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def measure_footprint(data):
+    """compare the size of the parsed memory with and without shared strings
+
+    Args:
+        data: string, the memory as json
+
+    Returns:
+        tuple of int, bytes allocated by the parsed memory and by the memory
+            after permamem.compact_memory
+    """
+    import permamem                             # pylint:disable=import-error
+
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        parsed = config.loads(data)
+        plain = tracemalloc.get_traced_memory()[0] - start
+        permamem.compact_memory(parsed["user_data"], parsed["convmem"])
+        compacted = tracemalloc.get_traced_memory()[0] - start
+    finally:
+        tracemalloc.stop()
+    return plain, compacted
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-u', '--users', type=int, default=50000,
+                        help="number of synthetic users")
+    parser.add_argument('-c', '--convs', type=int, default=2000,
+                        help="number of synthetic conversations")
+    parser.add_argument('-r', '--runs', type=int, default=3,
+                        help="repetitions per measurement, the best run is "
+                             "shown")
+    args = parser.parse_args()
+
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    random.seed(0)
+    memory = build_memory(args.users, args.convs)
+    print("encoder: %s" % ("orjson" if config.orjson is not None else "json"))
+    print("%-8s %10s %10s %12s" % ("format", "save [s]", "load [s]",
+                                   "size [kB]"))
+
+    directory = tempfile.mkdtemp()
+    try:
+        for serializer in config.SERIALIZERS:
+            path = os.path.join(directory, serializer + '.json')
+
+            def _save():
+                storage = config.Config(path, serializer=serializer)
+                storage.config = memory
+                storage._mark_dirty([])         # pylint:disable=protected-access
+                storage.flush()
+
+            def _load():
+                config.Config(path, serializer=serializer).load()
+
+            save_time = measure(_save, args.runs)
+            load_time = measure(_load, args.runs)
+            print("%-8s %10.3f %10.3f %12.1f" % (
+                serializer, save_time, load_time,
+                os.path.getsize(path) / 1024))
+    finally:
+        shutil.rmtree(directory)
+
+    plain, compacted = measure_footprint(config.compact_dumps(memory))
+    print("%-12s %12s %8s" % ("memory", "size [kB]", "saved"))
+    print("%-12s %12.1f" % ("plain", plain / 1024))
+    print("%-12s %12.1f %7.1f%%" % ("shared", compacted / 1024,
+                                     100 - 100 * compacted / plain))
+
+
+if __name__ == '__main__':
+    main()